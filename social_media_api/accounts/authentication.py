@@ -0,0 +1,162 @@
+"""API authentication.
+
+``AUTH_TOKEN_MODE`` selects what clients receive and what the API accepts:
+
+* ``'token'``: legacy DB tokens. DRF's ``TokenAuthentication`` joins
+  ``authtoken_token`` and the user table on every request;
+  ``CachedTokenAuthentication`` keeps the few user fields the API needs in the
+  cache for ``AUTH_TOKEN_CACHE_TIMEOUT`` seconds instead. Entries are keyed by
+  a hash of the token, never the token itself, and are dropped when the token
+  is deleted or rotated (logout) or the user is saved (password change,
+  deactivation).
+* ``'jwt'``: short-lived access tokens plus refresh tokens. The access token
+  carries the few claims the API needs (id, username, is_staff), and
+  ``StatelessJWTAuthentication`` builds the user from them with no database
+  hit. Refresh tokens are tracked by simplejwt's ``token_blacklist`` app, whose
+  table is the denylist for revoked and rotated refresh tokens; access tokens
+  revoked at logout are denylisted in the cache until they expire.
+* ``'both'``: issues and accepts both, for migrating clients.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import router
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from social_media_api import db_routing
+
+# Access token claims copied onto the user built by StatelessJWTAuthentication.
+USER_CLAIMS = ('username', 'is_staff')
+
+
+def _token_key(key):
+    return 'auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _user_key(user_id):
+    # Remembers which token entry belongs to a user, so a user save can drop
+    # it without looking the token up.
+    return f'auth:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    key = cache.get(_user_key(user_id))
+    if key is not None:
+        cache.delete_many([key, _user_key(user_id)])
+
+
+def _partial_user(values):
+    """Build a ``CustomUser`` loaded with only ``values``; other fields are deferred."""
+    model = get_user_model()
+    # from_db() expects the loaded field names in model field order.
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(router.db_for_read(model), names, [values[name] for name in names])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the few user fields the API needs.
+
+    The cache entry holds ``USER_CLAIMS`` plus the user's id and ``is_active``,
+    never the token row or the user's password hash; the user is rebuilt from
+    them the same way ``StatelessJWTAuthentication`` builds it from a JWT.
+    """
+
+    def authenticate_credentials(self, key):
+        values = cache.get(_token_key(key))
+        if values is None:
+            fields = ('id', 'is_active', *USER_CLAIMS)
+            row = (
+                get_user_model().objects.filter(auth_token__key=key)
+                .values_list(*fields).first()
+            )
+            if row is None:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            values = dict(zip(fields, row))
+            timeout = settings.AUTH_TOKEN_CACHE_TIMEOUT
+            cache.set_many({_token_key(key): values, _user_key(values['id']): _token_key(key)}, timeout)
+
+        if not values['is_active']:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        user = _partial_user(values)
+        token = Token.from_db(router.db_for_read(Token), ['key', 'user_id'], [key, user.pk])
+        token.user = user
+        db_routing.identify(user.pk)
+        return (user, token)
+
+
+def _denied_key(jti):
+    return f'auth:jwt:denied:{jti}'
+
+
+def issue_tokens(user):
+    """Return the credentials handed out at login/registration for ``AUTH_TOKEN_MODE``."""
+    credentials = {}
+    # Pins the user to the primary, so the next requests find the new credentials.
+    db_routing.identify(user.pk)
+    if settings.AUTH_TOKEN_MODE in ('token', 'both'):
+        credentials['token'] = Token.objects.get_or_create(user=user)[0].key
+    if settings.AUTH_TOKEN_MODE in ('jwt', 'both'):
+        refresh = RefreshToken.for_user(user)
+        for claim in USER_CLAIMS:
+            # Copied into every access token minted from this refresh token.
+            refresh[claim] = getattr(user, claim)
+        credentials['refresh'] = str(refresh)
+        credentials['access'] = str(refresh.access_token)
+    return credentials
+
+
+def deny_access_token(token):
+    """Reject a validated access token until it would have expired anyway."""
+    remaining = int(token['exp'] - time.time())
+    if remaining > 0:
+        cache.set(_denied_key(token['jti']), True, remaining)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT authentication that builds the user from the token's claims.
+
+    The user is a ``CustomUser`` instance loaded with only ``USER_CLAIMS``;
+    any other field is deferred and fetched on first access, like ``only()``.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if cache.get(_denied_key(token['jti'])):
+            raise InvalidToken(_('Token has been revoked.'))
+        return token
+
+    def get_user(self, validated_token):
+        model = get_user_model()
+        try:
+            # simplejwt serializes the user id as a string.
+            values = {'id': model._meta.pk.to_python(validated_token['user_id']), 'is_active': True}
+            values.update((claim, validated_token[claim]) for claim in USER_CLAIMS)
+        except (KeyError, ValidationError):
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        db_routing.identify(values['id'])
+        return _partial_user(values)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def _token_changed(sender, instance, **kwargs):
+    cache.delete(_token_key(instance.key))
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def _user_saved(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user(instance.pk)
@@ -0,0 +1,145 @@
+"""Profile picture storage and thumbnails.
+
+Uploaded pictures are stored under a name derived from the SHA-256 of their
+contents (``profile_pics/ab/abcdef….jpg``), so a URL always refers to the same
+bytes and can be cached forever; a new picture gets a new URL. After the
+upload commits, square thumbnails in ``THUMBNAIL_SIZES`` are rendered as WebP
+and JPEG on a small background thread pool (Pillow releases the GIL while it
+decodes and resizes), so requests never wait on image processing. Thumbnail
+names are derived from the original's name, which makes their URLs known up
+front: ``profile_pics/ab/abcdef…_64.webp``. A picture and its thumbnails are
+deleted once no user has it any more.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+# Square edge lengths in pixels, by name.
+THUMBNAIL_SIZES = {'small': 64, 'medium': 256}
+THUMBNAIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+THUMBNAIL_QUALITY = 85
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+
+
+def content_name(file, filename):
+    """Storage name for ``file``, derived from the SHA-256 of its contents."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    name = digest.hexdigest()
+    extension = os.path.splitext(filename)[1].lower() or '.jpg'
+    return f'profile_pics/{name[:2]}/{name}{extension}'
+
+
+def upload_to(instance, filename):
+    """``upload_to`` for ``CustomUser.profile_picture``: name the file after its content."""
+    return content_name(instance.profile_picture, filename)
+
+
+def store(file):
+    """Save an uploaded picture under its content name and return that name.
+
+    Pictures already in storage, e.g. the same file uploaded by another user,
+    are reused instead of being saved again under a suffixed name.
+    """
+    name = content_name(file, file.name)
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, file)
+
+
+def thumbnail_name(name, size, extension):
+    return f'{os.path.splitext(name)[0]}_{size}.{extension}'
+
+
+def thumbnail_urls(picture):
+    """``{'small': {'webp': url, 'jpeg': url}, ...}`` for a profile picture, or None without one."""
+    if not picture:
+        return None
+    return {
+        label: {
+            extension: default_storage.url(thumbnail_name(picture.name, size, extension))
+            for extension in THUMBNAIL_FORMATS
+        }
+        for label, size in THUMBNAIL_SIZES.items()
+    }
+
+
+def generate(name):
+    """Render the missing thumbnails of the picture stored at ``name``."""
+    largest = max(THUMBNAIL_SIZES.values())
+    with default_storage.open(name) as file, Image.open(file) as image:
+        # Lets JPEG decode at a reduced scale close to the largest thumbnail.
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for size in THUMBNAIL_SIZES.values():
+            thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            for extension, image_format in THUMBNAIL_FORMATS.items():
+                target = thumbnail_name(name, size, extension)
+                if default_storage.exists(target):
+                    continue
+                buffer = BytesIO()
+                thumbnail.save(buffer, image_format, quality=THUMBNAIL_QUALITY)
+                default_storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.AVATAR_THUMBNAIL_WORKERS, thread_name_prefix='avatar-thumbnails'
+            )
+    return _executor
+
+
+def _generate_logged(name):
+    try:
+        generate(name)
+    except Exception:
+        # The original stays usable; rerun generate_avatar_thumbnails to retry.
+        logger.exception('Could not render thumbnails for %s', name)
+
+
+def schedule(name):
+    """Render thumbnails for ``name`` in the background once the transaction commits."""
+    transaction.on_commit(lambda: _pool().submit(_generate_logged, name))
+
+
+def _delete_logged(names):
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except Exception:
+            logger.exception('Could not delete %s', name)
+
+
+def _delete_if_unreferenced(name):
+    if get_user_model().objects.filter(profile_picture=name).exists():
+        return
+    names = [name] + [
+        thumbnail_name(name, size, extension)
+        for size in THUMBNAIL_SIZES.values()
+        for extension in THUMBNAIL_FORMATS
+    ]
+    _pool().submit(_delete_logged, names)
+
+
+def discard(name):
+    """Delete the picture at ``name`` and its thumbnails once the transaction
+    commits, unless another user still has it."""
+    transaction.on_commit(lambda: _delete_if_unreferenced(name))
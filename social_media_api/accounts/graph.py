@@ -0,0 +1,190 @@
+"""Follow graph with cached adjacency sets.
+
+``CustomUser.followers`` is a self-referential M2M: a row in its through
+table with ``from_customuser=A`` and ``to_customuser=B`` means B follows A.
+This module keeps each user's following/follower ID sets and counts in the
+cache, so feed building and "do I follow X" checks do not touch the through
+table. Follows and unfollows made here (or through the M2M manager) keep the
+cache in sync; entries also expire after ``GRAPH_CACHE_TIMEOUT`` seconds.
+"""
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from django.core.cache import cache
+
+from .models import CustomUser
+
+Follow = CustomUser.followers.through
+GRAPH_CACHE_TIMEOUT = 60 * 60
+
+
+def _key(kind, user_id):
+    return f'graph:{kind}:{user_id}'
+
+
+def following_ids(user_id):
+    """IDs of the users ``user_id`` follows."""
+    ids = cache.get(_key('following', user_id))
+    if ids is None:
+        ids = frozenset(
+            Follow.objects.filter(to_customuser_id=user_id).values_list('from_customuser_id', flat=True)
+        )
+        cache.set(_key('following', user_id), ids, GRAPH_CACHE_TIMEOUT)
+    return ids
+
+
+def follower_ids(user_id):
+    """IDs of the users following ``user_id``."""
+    ids = cache.get(_key('followers', user_id))
+    if ids is None:
+        ids = frozenset(
+            Follow.objects.filter(from_customuser_id=user_id).values_list('to_customuser_id', flat=True)
+        )
+        cache.set(_key('followers', user_id), ids, GRAPH_CACHE_TIMEOUT)
+    return ids
+
+
+def _counts(kind, user_ids):
+    """Return ``{user_id: count}`` for ``kind`` in ('followers', 'following')."""
+    keys = {_key(f'{kind}_count', user_id): user_id for user_id in user_ids}
+    cached = cache.get_many(keys)
+    counts = {keys[key]: value for key, value in cached.items()}
+    missing = [user_id for user_id in user_ids if user_id not in counts]
+    if missing:
+        column, other = (
+            ('from_customuser_id', 'to_customuser_id') if kind == 'followers'
+            else ('to_customuser_id', 'from_customuser_id')
+        )
+        found = dict(
+            Follow.objects.filter(**{f'{column}__in': missing})
+            .values(column).annotate(n=Count(other)).values_list(column, 'n')
+        )
+        fresh = {user_id: found.get(user_id, 0) for user_id in missing}
+        cache.set_many({_key(f'{kind}_count', user_id): n for user_id, n in fresh.items()}, GRAPH_CACHE_TIMEOUT)
+        counts.update(fresh)
+    return counts
+
+
+def followers_counts(user_ids):
+    return _counts('followers', user_ids)
+
+
+def following_counts(user_ids):
+    return _counts('following', user_ids)
+
+
+def followers_count(user_id):
+    return followers_counts([user_id])[user_id]
+
+
+def following_count(user_id):
+    return following_counts([user_id])[user_id]
+
+
+def is_following_many(user_id, target_ids):
+    """Return ``{target_id: bool}`` for whether ``user_id`` follows each target."""
+    following = following_ids(user_id)
+    return {target_id: target_id in following for target_id in target_ids}
+
+
+def _incr(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+def invalidate(follower_ids_, followee_ids, delta=None):
+    """Sync the cache after edges between the two groups changed.
+
+    Cached sets are dropped immediately and again on commit. Counts are
+    shifted by ``delta`` per edge once the transaction commits, or dropped
+    when ``delta`` is None (the number of changed edges is unknown).
+    """
+    keys = [_key('following', user_id) for user_id in follower_ids_]
+    keys += [_key('followers', user_id) for user_id in followee_ids]
+    cache.delete_many(keys)
+
+    def on_commit():
+        cache.delete_many(keys)
+        if delta is None:
+            cache.delete_many(
+                [_key('following_count', user_id) for user_id in follower_ids_]
+                + [_key('followers_count', user_id) for user_id in followee_ids]
+            )
+            return
+        for user_id in follower_ids_:
+            _incr(_key('following_count', user_id), delta * len(followee_ids))
+        for user_id in followee_ids:
+            _incr(_key('followers_count', user_id), delta * len(follower_ids_))
+
+    transaction.on_commit(on_commit)
+
+
+def follow(user, target):
+    """Make ``user`` follow ``target``. Returns False if they already did."""
+    _, created = Follow.objects.get_or_create(from_customuser_id=target.id, to_customuser_id=user.id)
+    if created:
+        invalidate([user.id], [target.id], delta=1)
+    return created
+
+
+def unfollow(user, target):
+    """Make ``user`` stop following ``target``. Returns False if they did not."""
+    deleted, _ = Follow.objects.filter(from_customuser_id=target.id, to_customuser_id=user.id).delete()
+    if deleted:
+        invalidate([user.id], [target.id], delta=-1)
+    return bool(deleted)
+
+
+def follow_many(user, target_ids):
+    """Make ``user`` follow every existing user in ``target_ids``.
+
+    Uses one ``bulk_create(ignore_conflicts=True)`` into the through table.
+    Returns the IDs that were not followed before.
+    """
+    candidates = set(
+        CustomUser.objects.filter(id__in=target_ids).exclude(id=user.id).values_list('id', flat=True)
+    )
+    already = set(
+        Follow.objects.filter(to_customuser_id=user.id, from_customuser_id__in=candidates)
+        .values_list('from_customuser_id', flat=True)
+    )
+    new_ids = sorted(candidates - already)
+    Follow.objects.bulk_create(
+        [Follow(from_customuser_id=target_id, to_customuser_id=user.id) for target_id in new_ids],
+        ignore_conflicts=True,
+    )
+    if new_ids:
+        invalidate([user.id], new_ids, delta=1)
+    return new_ids
+
+
+def unfollow_many(user, target_ids):
+    """Make ``user`` stop following ``target_ids``. Returns the IDs that were followed."""
+    edges = Follow.objects.filter(to_customuser_id=user.id, from_customuser_id__in=target_ids)
+    removed = sorted(edges.values_list('from_customuser_id', flat=True))
+    if removed:
+        edges.filter(from_customuser_id__in=removed).delete()
+        invalidate([user.id], removed, delta=-1)
+    return removed
+
+
+@receiver(m2m_changed, sender=Follow)
+def _followers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep the cache in sync with changes made through the M2M managers."""
+    if action == 'pre_clear':
+        # clear() does not report which users it touched; look them up first.
+        manager = instance.following if reverse else instance.followers
+        pk_set = set(manager.values_list('id', flat=True))
+    elif action not in ('post_add', 'post_remove'):
+        return
+    # Counts are recomputed rather than shifted: add() and remove() skip
+    # rows that already (or no longer) exist without reporting them.
+    if reverse:
+        # instance.following.add(...): instance is the follower.
+        invalidate([instance.pk], list(pk_set))
+    else:
+        # instance.followers.add(...): instance is the followee.
+        invalidate(list(pk_set), [instance.pk])
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the iteration count taken from ``PASSWORD_HASH_ITERATIONS``.
+
+    It shares the ``pbkdf2_sha256`` algorithm name with Django's hasher, so
+    existing hashes verify as before and are rewritten with the configured
+    iteration count on the user's next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
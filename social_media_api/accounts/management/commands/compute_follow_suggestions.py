@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Precompute friends-of-friends follow suggestions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only refresh the suggestions of this user ID (repeatable).')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Users scored per transaction.')
+        parser.add_argument('--limit', type=int, default=suggestions.SUGGESTIONS_PER_USER,
+                            help='Suggestions kept per user.')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('id').values_list('id', flat=True)
+        if options['user_ids']:
+            users = users.filter(id__in=options['user_ids'])
+
+        users_done = rows = 0
+        batch = []
+        for user_id in users.iterator(chunk_size=options['batch_size']):
+            batch.append(user_id)
+            if len(batch) == options['batch_size']:
+                rows += suggestions.refresh(batch, options['limit'])
+                users_done += len(batch)
+                batch = []
+        if batch:
+            rows += suggestions.refresh(batch, options['limit'])
+            users_done += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'Stored {rows} suggestion(s) for {users_done} user(s).'))
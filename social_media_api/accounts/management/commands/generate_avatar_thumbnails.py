@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts import avatars
+
+
+class Command(BaseCommand):
+    help = 'Render missing profile picture thumbnails, e.g. for pictures uploaded before thumbnails existed.'
+
+    def handle(self, *args, **options):
+        pictures = (
+            get_user_model().objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+            .order_by('id').values_list('profile_picture', flat=True)
+        )
+        done = failed = 0
+        for name in pictures.iterator():
+            try:
+                avatars.generate(name)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'{name}: {exc}')
+            else:
+                done += 1
+        self.stdout.write(self.style.SUCCESS(f'Checked thumbnails for {done} picture(s); {failed} failed.'))
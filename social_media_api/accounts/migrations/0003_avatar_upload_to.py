@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:08
+
+import accounts.avatars
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_follow_suggestion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_picture',
+            field=models.ImageField(blank=True, null=True, upload_to=accounts.avatars.upload_to),
+        ),
+    ]
@@ -1,10 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from . import avatars
 
 class CustomUser(AbstractUser):
     bio = models.TextField(max_length=500, blank=True)
-    profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    profile_picture = models.ImageField(upload_to=avatars.upload_to, blank=True, null=True)
     followers = models.ManyToManyField('self', symmetrical=False, related_name='following')
 
     
@@ -12,3 +13,20 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
     
+
+class FollowSuggestion(models.Model):
+    """Precomputed "who to follow" entry, refreshed by compute_follow_suggestions."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='follow_suggestions')
+    suggested = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    # Number of accounts the user follows that also follow ``suggested``.
+    score = models.PositiveIntegerField()
+    computed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'suggested')
+        indexes = [
+            models.Index(fields=['user', '-score'], name='accounts_suggestion_score'),
+        ]
+
+    def __str__(self):
+        return f'{self.suggested} for {self.user} ({self.score})'
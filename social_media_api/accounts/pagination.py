@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class FollowCursorPagination(CursorPagination):
+    """Cursor pagination for follower/following lists.
+
+    Pages are cut with ``WHERE id > <cursor>`` on the user id, so deep pages
+    cost the same as the first and no ``COUNT(*)`` is run over large lists.
+    """
+    ordering = 'id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
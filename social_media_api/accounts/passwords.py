@@ -0,0 +1,110 @@
+"""Password hashing on a bounded worker pool.
+
+PBKDF2 is deliberately slow, and a burst of logins used to pin every web
+worker. Hashes are computed on a small thread pool (``hashlib`` releases the
+GIL while hashing). Admission is counted in the cache, so it is shared by every
+process and server mode: once ``PASSWORD_HASH_MAX_IN_FLIGHT`` hashes are running
+or waiting across the deployment, callers get a 429 straight away instead of
+queueing. Only the hashing runs on the pool: database reads and writes stay on
+the request thread and its connection.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, user_login_failed
+from django.contrib.auth import hashers
+from django.core.cache import cache
+from rest_framework.exceptions import Throttled
+
+ADMISSION_KEY = 'passwords:in_flight'
+# The counter starts over this long after it was created, which frees any
+# slots held by a worker that died mid-hash.
+ADMISSION_TIMEOUT = 60
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash',
+            )
+    return _executor
+
+
+def _admit():
+    if cache.add(ADMISSION_KEY, 1, ADMISSION_TIMEOUT):
+        return
+    try:
+        in_flight = cache.incr(ADMISSION_KEY)
+    except ValueError:
+        # Expired since add(); this caller is admitted into the next count.
+        return
+    if in_flight > settings.PASSWORD_HASH_MAX_IN_FLIGHT:
+        _release()
+        raise Throttled(wait=1, detail='Too many sign-ins in progress, please retry shortly.')
+
+
+def _release():
+    try:
+        cache.decr(ADMISSION_KEY)
+    except ValueError:
+        # The counter expired meanwhile and has nothing to release.
+        pass
+
+
+def run(func, *args):
+    """Run ``func(*args)`` on the hashing pool and wait for the result.
+
+    Raises ``Throttled`` (HTTP 429) when ``PASSWORD_HASH_MAX_IN_FLIGHT`` hashes
+    are already in progress.
+    """
+    _admit()
+    try:
+        return _pool().submit(func, *args).result()
+    finally:
+        _release()
+
+
+def make_password(raw_password):
+    return run(hashers.make_password, raw_password)
+
+
+def check_password(user, raw_password):
+    """Verify ``raw_password`` against ``user`` with a single hash.
+
+    A correct password stored with an outdated hasher or iteration count is
+    rehashed with the preferred one and saved, like ``User.check_password``.
+    """
+    is_correct, must_update = run(hashers.verify_password, raw_password, user.password)
+    if is_correct and must_update:
+        user.password = make_password(raw_password)
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+def authenticate(request, username, password):
+    """Return the active user matching the credentials, or None.
+
+    Equivalent to ``django.contrib.auth.authenticate`` with the default
+    ``ModelBackend``, the only backend this project uses, but hashing once on
+    the pool.
+    """
+    UserModel = get_user_model()
+    try:
+        user = UserModel._default_manager.get_by_natural_key(username)
+    except UserModel.DoesNotExist:
+        # Spend the same time as a real check so unknown usernames can't be
+        # told apart from wrong passwords.
+        make_password(password)
+        user = None
+    else:
+        if not (check_password(user, password) and user.is_active):
+            user = None
+    if user is None:
+        user_login_failed.send(sender=__name__, credentials={'username': username}, request=request)
+    return user
@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from django.contrib.auth import get_user_model, authenticate
-from rest_framework.authtoken.models import Token
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from . import avatars, graph, passwords
+from .models import FollowSuggestion
 
 User = get_user_model()
 
@@ -11,12 +13,13 @@ class RegisterSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
     def create(self, validated_data):
-        user = get_user_model().objects.create_user(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            password=validated_data['password']
+        # Same as create_user(), with the password hashed on the bounded pool.
+        user = User(
+            username=User.normalize_username(validated_data['username']),
+            email=User.objects.normalize_email(validated_data['email']),
         )
-        Token.objects.create(user=user)
+        user.password = passwords.make_password(validated_data['password'])
+        user.save()
         return user
     
 class LoginSerializer(serializers.Serializer):
@@ -24,12 +27,105 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField()
 
     def validate(self, data):
-        user = authenticate(**data)
-        if user and user.is_active:
-            return data
-        raise serializers.ValidationError("Incorrect Credentials")
+        user = passwords.authenticate(self.context.get('request'), data['username'], data['password'])
+        if user is None:
+            raise serializers.ValidationError("Incorrect Credentials")
+        data['user'] = user
+        return data
     
+class UserSummarySerializer(serializers.ModelSerializer):
+    """Compact user representation for follower/following lists."""
+    profile_picture_thumbnails = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'profile_picture', 'profile_picture_thumbnails')
+
+    def get_profile_picture_thumbnails(self, obj):
+        return avatars.thumbnail_urls(obj.profile_picture)
+
+
+class UserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Fetch the follow counts for the whole page in one go.
+        users = list(data.all() if hasattr(data, 'all') else data)
+        ids = [user.pk for user in users]
+        self.child.follow_counts = (graph.followers_counts(ids), graph.following_counts(ids))
+        return super().to_representation(users)
+
+
 class UserSerializer(serializers.ModelSerializer):
+    """User profile with follow counts.
+
+    Follower and following lists are served by the paginated
+    ``/users/<id>/followers/`` and ``/users/<id>/following/`` endpoints. Pass
+    ``?expand=followers,following`` to embed the first ``EXPAND_LIMIT`` of each.
+    """
+    EXPAND_LIMIT = 5
+    EXPANDABLE = ('followers', 'following')
+
+    followers_count = serializers.SerializerMethodField()
+    following_count = serializers.SerializerMethodField()
+    profile_picture_thumbnails = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'bio', 'profile_picture',
+                  'profile_picture_thumbnails', 'followers_count', 'following_count')
+        list_serializer_class = UserListSerializer
+
+    follow_counts = None
+
+    def get_followers_count(self, obj):
+        if self.follow_counts is not None:
+            return self.follow_counts[0][obj.pk]
+        return graph.followers_count(obj.pk)
+
+    def get_following_count(self, obj):
+        if self.follow_counts is not None:
+            return self.follow_counts[1][obj.pk]
+        return graph.following_count(obj.pk)
+
+    def get_profile_picture_thumbnails(self, obj):
+        return avatars.thumbnail_urls(obj.profile_picture)
+
+    def get_expand(self):
+        request = self.context.get('request')
+        if request is None:
+            return []
+        requested = request.query_params.get('expand', '').split(',')
+        return [name for name in self.EXPANDABLE if name in requested]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for name in self.get_expand():
+            sample = getattr(instance, name).order_by('id')[:self.EXPAND_LIMIT]
+            data[name] = UserSummarySerializer(sample, many=True, context=self.context).data
+        return data
+
+
+class AvatarSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'bio', 'profile_picture', 'followers')
+        fields = ('profile_picture',)
+        extra_kwargs = {'profile_picture': {'required': True, 'allow_null': False}}
+
+    def validate_profile_picture(self, value):
+        if value.size > settings.AVATAR_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f'Profile pictures may be at most {settings.AVATAR_MAX_UPLOAD_SIZE // (1024 * 1024)} MB.'
+            )
+        return value
+
+
+class BulkFollowSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['follow', 'unfollow'])
+    user_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=100)
+
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    user = UserSummarySerializer(source='suggested', read_only=True)
+
+    class Meta:
+        model = FollowSuggestion
+        fields = ('user', 'score')
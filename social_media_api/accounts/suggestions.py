@@ -0,0 +1,54 @@
+"""Friends-of-friends follow suggestions.
+
+Suggestions are computed offline by ``compute_follow_suggestions`` and stored
+in ``FollowSuggestion``, so the "who to follow" endpoint is a single indexed
+read. A candidate's score is the number of accounts the user follows that
+also follow the candidate.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .graph import Follow
+from .models import FollowSuggestion
+
+SUGGESTIONS_PER_USER = 20
+
+
+def _following_map(user_ids):
+    """Return ``{user_id: set of followee IDs}`` with one query."""
+    following = defaultdict(set)
+    edges = Follow.objects.filter(to_customuser_id__in=user_ids).values_list('to_customuser_id', 'from_customuser_id')
+    for follower_id, followee_id in edges.iterator(chunk_size=2000):
+        following[follower_id].add(followee_id)
+    return following
+
+
+def score(user_ids, limit=SUGGESTIONS_PER_USER):
+    """Return ``{user_id: [(candidate_id, score), ...]}``, best first."""
+    following = _following_map(user_ids)
+    second_hop = _following_map({followee for followees in following.values() for followee in followees})
+
+    results = {}
+    for user_id in user_ids:
+        followees = following.get(user_id, set())
+        counts = Counter()
+        for followee_id in followees:
+            counts.update(second_hop.get(followee_id, ()))
+        for excluded in followees | {user_id}:
+            counts.pop(excluded, None)
+        results[user_id] = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return results
+
+
+@transaction.atomic
+def refresh(user_ids, limit=SUGGESTIONS_PER_USER):
+    """Replace the stored suggestions of ``user_ids``. Returns the rows written."""
+    scored = score(user_ids, limit)
+    FollowSuggestion.objects.filter(user_id__in=user_ids).delete()
+    rows = FollowSuggestion.objects.bulk_create(
+        FollowSuggestion(user_id=user_id, suggested_id=candidate_id, score=value)
+        for user_id, candidates in scored.items()
+        for candidate_id, value in candidates
+    )
+    return len(rows)
@@ -1,3 +1,541 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import hashers
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import InvalidToken
+from posts.models import Post, TimelineEntry
+from social_media_api import throttling
+from social_media_api.throttling import ScopedRateThrottle
+from PIL import Image
+from . import avatars, graph, passwords, suggestions
+from .authentication import StatelessJWTAuthentication, _token_key
+from .models import FollowSuggestion
+
+User = get_user_model()
+
+
+class FollowGraphTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', password='testpass123')
+        self.carol = User.objects.create_user(username='carol', password='testpass123')
+
+    def follow(self, user, target):
+        self.client.force_authenticate(user=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('follow_user', kwargs={'user_id': target.pk}))
+
+    def unfollow(self, user, target):
+        self.client.force_authenticate(user=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('unfollow_user', kwargs={'user_id': target.pk}))
+
+    def test_follow_updates_cached_sets_and_counts(self):
+        # Warm the cache so the follow has to keep it in sync.
+        self.assertEqual(graph.following_ids(self.alice.pk), frozenset())
+        self.assertEqual(graph.followers_count(self.bob.pk), 0)
+        self.assertEqual(graph.following_count(self.alice.pk), 0)
+
+        response = self.follow(self.alice, self.bob)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.follow(self.alice, self.carol)
+
+        self.assertEqual(graph.following_ids(self.alice.pk), {self.bob.pk, self.carol.pk})
+        # Counts are shifted in place rather than recomputed.
+        with self.assertNumQueries(0):
+            self.assertEqual(graph.followers_count(self.bob.pk), 1)
+            self.assertEqual(graph.following_count(self.alice.pk), 2)
+
+    def test_repeated_follow_does_not_double_count(self):
+        graph.followers_count(self.bob.pk)
+        self.follow(self.alice, self.bob)
+        self.follow(self.alice, self.bob)
+        self.assertEqual(graph.followers_count(self.bob.pk), 1)
+        self.assertEqual(self.bob.followers.count(), 1)
+
+    def test_unfollow_updates_cache(self):
+        self.follow(self.alice, self.bob)
+        self.assertEqual(graph.follower_ids(self.bob.pk), {self.alice.pk})
+        self.unfollow(self.alice, self.bob)
+        self.assertEqual(graph.follower_ids(self.bob.pk), frozenset())
+        self.assertEqual(graph.followers_count(self.bob.pk), 0)
+        self.assertEqual(graph.following_count(self.alice.pk), 0)
+
+    def test_is_following_many_is_one_lookup(self):
+        self.follow(self.alice, self.bob)
+        with self.assertNumQueries(1):
+            result = graph.is_following_many(self.alice.pk, [self.bob.pk, self.carol.pk])
+        self.assertEqual(result, {self.bob.pk: True, self.carol.pk: False})
+        with self.assertNumQueries(0):
+            graph.is_following_many(self.alice.pk, [self.bob.pk, self.carol.pk])
+
+    def test_bulk_counts_use_one_query(self):
+        self.follow(self.alice, self.bob)
+        self.follow(self.carol, self.bob)
+        with self.assertNumQueries(1):
+            counts = graph.followers_counts([self.alice.pk, self.bob.pk, self.carol.pk])
+        self.assertEqual(counts, {self.alice.pk: 0, self.bob.pk: 2, self.carol.pk: 0})
+
+    def test_m2m_manager_changes_invalidate_cache(self):
+        self.assertEqual(graph.follower_ids(self.bob.pk), frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.following.add(self.bob)
+        self.assertEqual(graph.follower_ids(self.bob.pk), {self.alice.pk})
+        self.assertEqual(graph.following_ids(self.alice.pk), {self.bob.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.followers.clear()
+        self.assertEqual(graph.following_ids(self.alice.pk), frozenset())
+        self.assertEqual(graph.followers_count(self.bob.pk), 0)
+
+
+class FollowListTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.star = User.objects.create_user(username='star', password='testpass123')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='testpass123') for i in range(7)]
+        self.star.followers.add(*self.fans)
+        self.client.force_authenticate(user=self.fans[0])
+
+    def test_followers_are_cursor_paginated(self):
+        url = reverse('user_followers', kwargs={'pk': self.star.pk}) + '?page_size=3'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen += [user['username'] for user in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, [fan.username for fan in self.fans])
+
+    def test_following_list(self):
+        response = self.client.get(reverse('user_following', kwargs={'pk': self.fans[0].pk}))
+        self.assertEqual([user['id'] for user in response.data['results']], [self.star.pk])
+
+    def test_unknown_user_returns_404(self):
+        response = self.client.get(reverse('user_followers', kwargs={'pk': 9999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_user_detail_has_counts_not_follower_ids(self):
+        response = self.client.get(reverse('user_detail', kwargs={'pk': self.star.pk}))
+        self.assertEqual(response.data['followers_count'], 7)
+        self.assertEqual(response.data['following_count'], 0)
+        self.assertNotIn('followers', response.data)
+
+    def test_expand_embeds_a_small_sample(self):
+        response = self.client.get(reverse('user_detail', kwargs={'pk': self.star.pk}) + '?expand=followers')
+        self.assertEqual(len(response.data['followers']), 5)
+        self.assertEqual(response.data['followers'][0]['username'], 'fan0')
+        self.assertNotIn('following', response.data)
+
+    def test_user_list_query_count_does_not_grow_with_page(self):
+        url = reverse('user_list')
+        with self.assertNumQueries(4):
+            # count, page, followers counts, following counts
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 8)
+
+
+class BulkFollowTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='newbie', password='testpass123')
+        self.others = [User.objects.create_user(username=f'user{i}', password='testpass123') for i in range(5)]
+        self.ids = [other.pk for other in self.others]
+        for other in self.others:
+            Post.objects.create(title=f'Post by {other.username}', content='Content', author=other)
+        self.client.force_authenticate(user=self.user)
+
+    def post(self, action, user_ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('bulk_follow'), {'action': action, 'user_ids': user_ids}, format='json')
+
+    def test_bulk_follow(self):
+        response = self.post('follow', self.ids + [self.user.pk, 9999])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['followed'], self.ids)
+        self.assertEqual(set(self.user.following.values_list('id', flat=True)), set(self.ids))
+        self.assertEqual(TimelineEntry.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(graph.following_count(self.user.pk), 5)
+
+    def test_bulk_follow_is_idempotent(self):
+        self.post('follow', self.ids[:2])
+        response = self.post('follow', self.ids)
+        self.assertEqual(response.data['followed'], self.ids[2:])
+        self.assertEqual(self.user.following.count(), 5)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        self.post('follow', self.ids[:1])
+        with self.assertNumQueries(8):
+            self.post('follow', self.ids[1:])
+
+    def test_bulk_unfollow(self):
+        self.post('follow', self.ids)
+        response = self.post('unfollow', self.ids[:3])
+        self.assertEqual(response.data['unfollowed'], self.ids[:3])
+        self.assertEqual(set(graph.following_ids(self.user.pk)), set(self.ids[3:]))
+        self.assertEqual(TimelineEntry.objects.filter(user=self.user).count(), 2)
+
+    def test_rejects_oversized_batch(self):
+        response = self.post('follow', list(range(1, 102)))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FollowSuggestionTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.me, self.friend1, self.friend2, self.popular, self.niche = (
+            User.objects.create_user(username=name, password='testpass123')
+            for name in ('me', 'friend1', 'friend2', 'popular', 'niche')
+        )
+        self.me.following.add(self.friend1, self.friend2)
+        self.friend1.following.add(self.popular, self.niche, self.me)
+        self.friend2.following.add(self.popular)
+
+    def test_scores_friends_of_friends(self):
+        self.assertEqual(
+            suggestions.score([self.me.pk])[self.me.pk],
+            [(self.popular.pk, 2), (self.niche.pk, 1)],
+        )
+
+    def test_command_stores_and_endpoint_serves_suggestions(self):
+        call_command('compute_follow_suggestions', stdout=StringIO())
+        self.assertEqual(FollowSuggestion.objects.filter(user=self.me).count(), 2)
+
+        self.client.force_authenticate(user=self.me)
+        response = self.client.get(reverse('follow_suggestions'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(s['user']['username'], s['score']) for s in response.data], [('popular', 2), ('niche', 1)])
+
+    def test_followed_suggestions_are_hidden(self):
+        suggestions.refresh([self.me.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.me.following.add(self.popular)
+        self.client.force_authenticate(user=self.me)
+        response = self.client.get(reverse('follow_suggestions'))
+        self.assertEqual([s['user']['username'] for s in response.data], ['niche'])
+
+
+class CachedTokenAuthenticationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('profile')
+
+    def test_warm_request_skips_token_lookup(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('authtoken_token' in query['sql'] for query in queries))
+
+    def test_cache_holds_only_the_needed_user_fields(self):
+        self.client.get(self.url)
+        entry = cache.get(_token_key(self.token.key))
+        self.assertEqual(entry, {'id': self.user.pk, 'is_active': True, 'username': 'reader', 'is_staff': False})
+
+    def test_logout_revokes_cached_token(self):
+        self.client.get(self.url)
+        response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivating_user_invalidates_cached_lookup(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rotated_token_stops_working(self):
+        self.client.get(self.url)
+        self.token.delete()
+        Token.objects.create(user=self.user)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(AUTH_TOKEN_MODE='jwt')
+class JWTAuthenticationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='jwtuser', password='testpass123')
+        self.factory = APIRequestFactory()
+
+    def login(self):
+        response = self.client.post(reverse('login'), {'username': 'jwtuser', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def authenticate(self, access):
+        request = Request(self.factory.get('/', HTTP_AUTHORIZATION='Bearer ' + access))
+        return StatelessJWTAuthentication().authenticate(request)
+
+    def test_login_issues_jwt_pair_only(self):
+        data = self.login()
+        self.assertIn('access', data)
+        self.assertIn('refresh', data)
+        self.assertNotIn('token', data)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+
+    def test_authenticates_without_queries(self):
+        access = self.login()['access']
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(access)
+        self.assertEqual((user.pk, user.username, user.is_active), (self.user.pk, 'jwtuser', True))
+        # Fields not carried in the token load lazily.
+        self.assertEqual(user.email, self.user.email)
+
+    def test_profile_loads_user_row_once(self):
+        user, access = self.authenticate(self.login()['access'])
+        self.client.force_authenticate(user=user, token=access)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.user.email)
+        user_table = User._meta.db_table
+        self.assertEqual(len([q for q in queries if f'FROM "{user_table}"' in q['sql']]), 1)
+
+    def test_refresh_rotates_and_denylists(self):
+        refresh = self.login()['refresh']
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user, _ = self.authenticate(response.data['access'])
+        self.assertEqual(user.username, 'jwtuser')
+        # The rotated refresh token is on the denylist.
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_access_and_refresh(self):
+        tokens = self.login()
+        _, access = self.authenticate(tokens['access'])
+        self.client.force_authenticate(user=self.user, token=access)
+        response = self.client.post(reverse('logout'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertRaises(InvalidToken):
+            self.authenticate(tokens['access'])
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class RegisterTest(APITestCase):
+    def test_register_creates_a_single_token(self):
+        response = self.client.post(reverse('register'), {
+            'username': 'fresh', 'email': 'fresh@example.com', 'password': 'testpass123',
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Token.objects.get(user__username='fresh').key, response.data['token'])
+
+    @override_settings(AUTH_TOKEN_MODE='both')
+    def test_register_in_both_mode_issues_both(self):
+        response = self.client.post(reverse('register'), {
+            'username': 'fresh', 'email': 'fresh@example.com', 'password': 'testpass123',
+        })
+        self.assertEqual({'token', 'access', 'refresh'} - set(response.data), set())
+
+
+class LoginHashingTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='hasher', password='testpass123')
+
+    def login(self, password='testpass123'):
+        return self.client.post(reverse('login'), {'username': 'hasher', 'password': password})
+
+    def test_login_hashes_once(self):
+        with mock.patch('django.contrib.auth.hashers.verify_password', wraps=hashers.verify_password) as verify:
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(verify.call_count, 1)
+
+    def test_wrong_password_and_unknown_user(self):
+        self.assertEqual(self.login('wrong').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('login'), {'username': 'nobody', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PASSWORD_HASH_MAX_IN_FLIGHT=2)
+    def test_saturated_pool_returns_429(self):
+        # Hashes already running in other processes.
+        cache.set(passwords.ADMISSION_KEY, 2)
+        self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(cache.get(passwords.ADMISSION_KEY), 2)
+        cache.decr(passwords.ADMISSION_KEY)
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertEqual(cache.get(passwords.ADMISSION_KEY), 1)
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_login_rehashes_to_tuned_iterations(self):
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    def test_login_is_rate_limited(self):
+        self.addCleanup(throttling.reset)
+        with mock.patch.dict(ScopedRateThrottle.THROTTLE_RATES, {'login': '2/minute'}):
+            self.login()
+            self.login('wrong')
+            self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class FixedWindowThrottleTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(throttling.reset)
+        self.user = User.objects.create_user(username='throttled', password='testpass123')
+        self.request = Request(APIRequestFactory().get('/'))
+        self.request.user = self.user
+
+    def throttle(self, now):
+        throttle = throttling.UserRateThrottle()
+        throttle.rate = '3/minute'
+        throttle.num_requests, throttle.duration = 3, 60
+        throttle.timer = lambda: now
+        return throttle
+
+    def test_counts_per_window(self):
+        allowed = [self.throttle(120.0 + i).allow_request(self.request, None) for i in range(4)]
+        self.assertEqual(allowed, [True, True, True, False])
+        self.assertEqual(cache.get(f'throttle_user_{self.user.pk}:2'), 4)
+
+        throttle = self.throttle(150.0)
+        self.assertFalse(throttle.allow_request(self.request, None))
+        self.assertEqual(throttle.wait(), 30)
+        # The next window starts a fresh counter.
+        self.assertTrue(self.throttle(180.0).allow_request(self.request, None))
+
+    def test_blocked_clients_skip_the_cache(self):
+        for i in range(4):
+            self.throttle(120.0 + i).allow_request(self.request, None)
+        with mock.patch.object(throttling, '_increment') as increment:
+            self.assertFalse(self.throttle(130.0).allow_request(self.request, None))
+        increment.assert_not_called()
+
+
+class AvatarTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Run thumbnail jobs on a pool the test can wait for.
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        patcher = mock.patch.object(avatars, '_pool', side_effect=lambda: self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='pictured', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def picture(self, color='red', size=(600, 400)):
+        buffer = BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'JPEG')
+        return SimpleUploadedFile('Me At The Beach.JPG', buffer.getvalue(), content_type='image/jpeg')
+
+    def wait_for_pool(self):
+        self.pool.shutdown(wait=True)
+        self.pool = ThreadPoolExecutor(max_workers=1)
+
+    def upload(self, picture):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(reverse('profile_avatar'), {'profile_picture': picture}, format='multipart')
+        self.wait_for_pool()
+        return response
+
+    def stored_names(self, name):
+        return [name] + [
+            avatars.thumbnail_name(name, size, extension)
+            for size in avatars.THUMBNAIL_SIZES.values()
+            for extension in avatars.THUMBNAIL_FORMATS
+        ]
+
+    def test_upload_stores_content_hashed_picture_and_thumbnails(self):
+        picture = self.picture()
+        digest = hashlib.sha256(picture.read()).hexdigest()
+        picture.seek(0)
+        response = self.upload(picture)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_picture.name, f'profile_pics/{digest[:2]}/{digest}.jpg')
+
+        thumbnails = response.data['profile_picture_thumbnails']
+        self.assertEqual(thumbnails['small']['webp'], f'/media/profile_pics/{digest[:2]}/{digest}_64.webp')
+        for size in avatars.THUMBNAIL_SIZES.values():
+            for extension in avatars.THUMBNAIL_FORMATS:
+                name = avatars.thumbnail_name(self.user.profile_picture.name, size, extension)
+                with default_storage.open(name) as file, Image.open(file) as image:
+                    self.assertEqual(image.size, (size, size))
+
+    def test_rejects_non_images_and_oversized_uploads(self):
+        text = SimpleUploadedFile('notes.jpg', b'not an image', content_type='image/jpeg')
+        self.assertEqual(self.upload(text).status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(AVATAR_MAX_UPLOAD_SIZE=100):
+            self.assertEqual(self.upload(self.picture()).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_and_users_without_picture(self):
+        self.upload(self.picture())
+        response = self.client.delete(reverse('profile_avatar'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get(reverse('user_detail', kwargs={'pk': self.user.pk}))
+        self.assertIsNone(response.data['profile_picture'])
+        self.assertIsNone(response.data['profile_picture_thumbnails'])
+
+    def test_same_picture_is_stored_once(self):
+        self.upload(self.picture())
+        first = User.objects.get(pk=self.user.pk).profile_picture.name
+        other = User.objects.create_user(username='twin', password='testpass123')
+        self.client.force_authenticate(user=other)
+        self.upload(self.picture())
+        other.refresh_from_db()
+        self.assertEqual(other.profile_picture.name, first)
+        directory = os.path.dirname(first)
+        self.assertEqual(len(default_storage.listdir(directory)[1]), len(self.stored_names(first)))
+
+    def test_replaced_and_removed_pictures_are_deleted(self):
+        self.upload(self.picture('red'))
+        red = User.objects.get(pk=self.user.pk).profile_picture.name
+        self.upload(self.picture('blue'))
+        blue = User.objects.get(pk=self.user.pk).profile_picture.name
+        self.assertFalse(any(default_storage.exists(name) for name in self.stored_names(red)))
+        self.assertTrue(all(default_storage.exists(name) for name in self.stored_names(blue)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('profile_avatar'))
+        self.wait_for_pool()
+        self.assertFalse(any(default_storage.exists(name) for name in self.stored_names(blue)))
+
+    def test_shared_picture_is_kept(self):
+        self.upload(self.picture())
+        name = User.objects.get(pk=self.user.pk).profile_picture.name
+        User.objects.create_user(username='twin', password='testpass123', profile_picture=name)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('profile_avatar'))
+        self.wait_for_pool()
+        self.assertTrue(all(default_storage.exists(name) for name in self.stored_names(name)))
@@ -1,11 +1,24 @@
 from django.urls import path
-from .views import RegisterView, LoginView, ProfileView, FollowUserView, UnfollowUserView
+from rest_framework_simplejwt.views import TokenRefreshView
+from .views import (
+    RegisterView, LoginView, LogoutView, ProfileView, AvatarView, FollowUserView, UnfollowUserView,
+    UserListView, UserDetailView, FollowListView, BulkFollowView, FollowSuggestionsView,
+)
 
 urlpatterns = [
          path('register/', RegisterView.as_view(), name='register'),
          path('login/', LoginView.as_view(), name='login'),
+         path('logout/', LogoutView.as_view(), name='logout'),
+         path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
          path('profile/', ProfileView.as_view(), name='profile'),
+         path('profile/avatar/', AvatarView.as_view(), name='profile_avatar'),
          path('follow/<int:user_id>/', FollowUserView.as_view(), name='follow_user'),
          path('unfollow/<int:user_id>/', UnfollowUserView.as_view(), name='unfollow_user'),
+         path('follow/bulk/', BulkFollowView.as_view(), name='bulk_follow'),
+         path('suggestions/', FollowSuggestionsView.as_view(), name='follow_suggestions'),
+         path('users/', UserListView.as_view(), name='user_list'),
+         path('users/<int:pk>/', UserDetailView.as_view(), name='user_detail'),
+         path('users/<int:pk>/followers/', FollowListView.as_view(relation='followers'), name='user_followers'),
+         path('users/<int:pk>/following/', FollowListView.as_view(relation='following'), name='user_following'),
 
 ]
\ No newline at end of file
@@ -1,11 +1,24 @@
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, permissions
-from django.contrib.auth import authenticate
-from .serializers import RegisterSerializer, LoginSerializer, UserSerializer
+from .serializers import (
+    RegisterSerializer, LoginSerializer, UserSerializer, UserSummarySerializer,
+    AvatarSerializer, BulkFollowSerializer, FollowSuggestionSerializer,
+)
 from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from social_media_api.throttling import ScopedRateThrottle
+from django.db import transaction
 from .models import CustomUser
+from . import avatars, graph
+from .authentication import deny_access_token, issue_tokens
+from .pagination import FollowCursorPagination
+from posts import timeline
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
@@ -20,34 +33,94 @@ class RegisterView(APIView):
         serializer = RegisterSerializer(data=data)
         if serializer.is_valid():
          user = serializer.save()
-         token = Token.objects.create(user=user)
-         return Response({'message': 'User created successfully', 'token': token.key}, 
+         return Response({'message': 'User created successfully', **issue_tokens(user)},
                             status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
 
 class LoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [*APIView.throttle_classes, ScopedRateThrottle]
+    throttle_scope = 'login'
     
     def post(self, request):
-        serializer = LoginSerializer(data=request.data)
+        serializer = LoginSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        username = serializer.validated_data['username']
-        password = serializer.validated_data['password']
-        user = authenticate(username=username, password=password)
-        if user is None:
-            return Response({'error': 'Invalid credentials'}, 
-                            status=status.HTTP_401_UNAUTHORIZED)
-        token, created = Token.objects.get_or_create(user=user)
-        return Response({'message': 'Login successful', 'token': token.key}, 
+        user = serializer.validated_data['user']
+        return Response({'message': 'Login successful', **issue_tokens(user)},
                         status=status.HTTP_200_OK)
-class ProfileView(APIView):
+
+
+class LogoutView(APIView):
+    """Revoke the caller's credentials.
+
+    Deletes the legacy token (dropping its cached lookup), denylists the JWT
+    access token used for this request and, if given, the ``refresh`` token.
+    """
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        user = request.user
-        return Response(UserSerializer(user).data, status=status.HTTP_200_OK)
-    
+    def post(self, request):
+        if isinstance(request.auth, Token):
+            Token.objects.filter(user=request.user).delete()
+        elif request.auth is not None:
+            deny_access_token(request.auth)
+        if request.data.get('refresh'):
+            try:
+                refresh = RefreshToken(request.data['refresh'])
+            except TokenError:
+                return Response({'error': 'Invalid refresh token'}, status=status.HTTP_400_BAD_REQUEST)
+            if str(refresh['user_id']) != str(request.user.pk):
+                return Response({'error': 'Invalid refresh token'}, status=status.HTTP_400_BAD_REQUEST)
+            refresh.blacklist()
+        return Response({'message': 'Logout successful'}, status=status.HTTP_200_OK)
+
+
+class ProfileView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        # The authenticated user carries only a few fields; load the whole row
+        # in one query rather than each deferred field on first access.
+        user = await CustomUser.objects.aget(pk=request.user.pk)
+        serializer = UserSerializer(user, context={'request': request})
+        # Follow counts hit the database.
+        data = await sync_to_async(lambda: serializer.data)()
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class AvatarView(APIView):
+    """Upload (PUT, multipart ``profile_picture``) or remove (DELETE) the caller's picture.
+
+    Thumbnails are rendered in the background after the upload is saved, and
+    the previous picture is deleted once no one else uses it.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def put(self, request):
+        serializer = AvatarSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = CustomUser.objects.get(pk=request.user.pk)
+        previous = user.profile_picture.name
+        with transaction.atomic():
+            user.profile_picture = avatars.store(serializer.validated_data['profile_picture'])
+            user.save(update_fields=['profile_picture'])
+            avatars.schedule(user.profile_picture.name)
+            if previous and previous != user.profile_picture.name:
+                avatars.discard(previous)
+        return Response(UserSerializer(user, context={'request': request}).data, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        user = CustomUser.objects.get(pk=request.user.pk)
+        previous = user.profile_picture.name
+        with transaction.atomic():
+            user.profile_picture = None
+            user.save(update_fields=['profile_picture'])
+            if previous:
+                avatars.discard(previous)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class FollowUserView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -57,7 +130,8 @@ class FollowUserView(APIView):
                 return Response({'error': 'You cannot follow yourself'},
                                 status=status.HTTP_400_BAD_REQUEST)
             user_to_follow = CustomUser.objects.get(id=user_id)
-            request.user.following.add(user_to_follow)
+            if graph.follow(request.user, user_to_follow):
+                timeline.backfill(request.user, user_to_follow)
             return Response({'message': f'You are now following {user_to_follow.username}'},
                             status=status.HTTP_200_OK)
         except CustomUser.DoesNotExist:
@@ -77,17 +151,55 @@ class UnfollowUserView(APIView):
                 return Response({'error': 'You cannot unfollow yourself'},
                                 status=status.HTTP_400_BAD_REQUEST)
             user_to_unfollow = CustomUser.objects.get(id=user_id)
-            request.user.following.remove(user_to_unfollow)
+            if graph.unfollow(request.user, user_to_unfollow):
+                timeline.remove_author(request.user, user_to_unfollow)
             return Response({'message': f'You have unfollowed {user_to_unfollow.username}'},
                             status=status.HTTP_200_OK)
         except CustomUser.DoesNotExist:
             return Response({'error': 'User not found'},
                             status=status.HTTP_404_NOT_FOUND)
 
+class BulkFollowView(APIView):
+    """Follow or unfollow up to 100 users in one request."""
+    permission_classes = [IsAuthenticated]
+
+    @transaction.atomic
+    def post(self, request):
+        serializer = BulkFollowSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = serializer.validated_data['user_ids']
+        if serializer.validated_data['action'] == 'follow':
+            followed = graph.follow_many(request.user, user_ids)
+            timeline.backfill_many(request.user, followed)
+            return Response({'followed': followed}, status=status.HTTP_200_OK)
+        unfollowed = graph.unfollow_many(request.user, user_ids)
+        if unfollowed:
+            timeline.remove_authors(request.user, unfollowed)
+        return Response({'unfollowed': unfollowed}, status=status.HTTP_200_OK)
+
+
+class FollowSuggestionsView(generics.ListAPIView):
+    """Precomputed "who to follow" list, best match first."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = FollowSuggestionSerializer
+    filter_backends = []
+    # At most SUGGESTIONS_PER_USER rows are stored per user.
+    pagination_class = None
+
+    def get_queryset(self):
+        user = self.request.user
+        return (
+            user.follow_suggestions
+            .exclude(suggested_id__in=graph.following_ids(user.id))
+            .select_related('suggested')
+            .order_by('-score', 'suggested_id')
+        )
+
+
 class UserListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = UserSerializer
-    queryset = CustomUser.objects.all()
+    queryset = CustomUser.objects.order_by('id')
 
 class UserDetailView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -97,4 +209,19 @@ class UserDetailView(generics.GenericAPIView):
     def get(self, request, pk):
         user = self.get_object()
         serializer = self.get_serializer(user)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+class FollowListView(generics.ListAPIView):
+    """Cursor-paginated list of a user's followers or of the users they follow."""
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = UserSummarySerializer
+    pagination_class = FollowCursorPagination
+    filter_backends = []
+    # 'followers': users following <pk>; 'following': users <pk> follows.
+    relation = 'followers'
+
+    def get_queryset(self):
+        user = generics.get_object_or_404(CustomUser.objects.only('id'), pk=self.kwargs['pk'])
+        lookup = 'following' if self.relation == 'followers' else 'followers'
+        return CustomUser.objects.filter(**{lookup: user}).only('id', 'username', 'profile_picture')
@@ -0,0 +1,59 @@
+"""Per-request query count and latency of token authentication.
+
+Sends authenticated ``GET /api/posts/`` requests through ``PostViewSet.list``
+with DRF's ``TokenAuthentication`` and with ``CachedTokenAuthentication`` and
+prints the queries each request runs::
+
+    python -m benchmarks.auth_queries
+"""
+import sys
+
+from benchmarks import harness
+
+ITERATIONS = 200
+
+
+def measure(authentication_class, token):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+    from posts.views import PostViewSet
+
+    PostViewSet.authentication_classes = [authentication_class]
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+    cache.clear()
+
+    def get():
+        response = client.get('/api/posts/')
+        assert response.status_code == 200, response.status_code
+
+    get()  # warm the caches
+    with CaptureQueriesContext(connection) as queries:
+        get()
+    return len(queries), harness.timed(get, ITERATIONS)
+
+
+def main():
+    from django.contrib.auth import get_user_model
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.authtoken.models import Token
+    from accounts.authentication import CachedTokenAuthentication
+    from posts.models import Post
+
+    user = get_user_model().objects.create_user(username='bench', password='bench-pass-123')
+    Post.objects.bulk_create(Post(title=f'Post {i}', content='Content', author=user) for i in range(50))
+    token = Token.objects.create(user=user).key
+
+    for label, authentication_class in (
+        ('TokenAuthentication', TokenAuthentication),
+        ('CachedTokenAuthentication', CachedTokenAuthentication),
+    ):
+        count, seconds = measure(authentication_class, token)
+        print(f'{label:28} {count} queries/request  {seconds * 1000:.2f} ms/request')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(harness.run(main))
@@ -0,0 +1,118 @@
+"""Requests/sec with and without database connection reuse.
+
+Sends authenticated ``GET /api/posts/`` requests straight into Django's WSGI
+handler from ``THREADS`` threads, the way a gthread worker would, so every
+request goes through the usual ``close_old_connections`` handling. Each mode
+runs in a fresh process because connection settings are read at startup.
+Point the ``DB_*`` variables at a PostgreSQL server and run::
+
+    python -m benchmarks.db_connections
+
+The cache is swapped for local memory so that only the database differs
+between modes.
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from benchmarks import harness
+
+MODES = {
+    'new connection per request': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '0'},
+    'persistent (CONN_MAX_AGE=60)': {'DB_POOL': 'false', 'DB_CONN_MAX_AGE': '60'},
+    'psycopg pool': {'DB_POOL': 'true', 'DB_POOL_MAX_SIZE': '4'},
+}
+THREADS = 4
+REQUESTS = 2000
+
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def measure():
+    from django.test.utils import override_settings
+
+    with override_settings(CACHES=LOCAL_CACHE, ALLOWED_HOSTS=['localhost']):
+        result = _measure()
+    print(json.dumps(result))
+    return 0
+
+
+def _measure():
+    from django.contrib.auth import get_user_model
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+    from rest_framework.authtoken.models import Token
+    from posts.models import Post
+    from posts.views import PostViewSet
+
+    PostViewSet.throttle_classes = []
+    user = get_user_model().objects.create_user(username='bench', password='bench-pass-123')
+    Post.objects.bulk_create(Post(title=f'Post {i}', content='Content', author=user) for i in range(50))
+    token = Token.objects.create(user=user).key
+
+    # Server process IDs: a pooled connection handed out again keeps its ID.
+    opened = set()
+    lock = threading.Lock()
+
+    def count_connection(sender, connection, **kwargs):
+        with lock:
+            opened.add(connection.connection.info.backend_pid)
+
+    connection_created.connect(count_connection)
+    handler = WSGIHandler()
+
+    def request():
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/posts/', 'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '443', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost', 'HTTP_X_FORWARDED_PROTO': 'https',
+            'HTTP_AUTHORIZATION': 'Token ' + token,
+            'wsgi.url_scheme': 'https', 'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr,
+        }
+        statuses = []
+        response = handler(environ, lambda status, headers: statuses.append(status))
+        try:
+            b''.join(response)
+        finally:
+            response.close()  # Fires request_finished, which closes or keeps the connection.
+        assert statuses[0].startswith('200'), statuses[0]
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        list(pool.map(lambda _: request(), range(THREADS * 5)))  # warm up
+        warm = set(opened)
+        start = time.perf_counter()
+        list(pool.map(lambda _: request(), range(REQUESTS)))
+        elapsed = time.perf_counter() - start
+
+        # Close every thread's persistent connection so the test database can be dropped.
+        barrier = threading.Barrier(THREADS)
+        list(pool.map(lambda _: (barrier.wait(), connections.close_all()), range(THREADS)))
+    return {'rps': REQUESTS / elapsed, 'connections': len(opened - warm)}
+
+
+def main():
+    print(f'{REQUESTS} requests from {THREADS} threads')
+    for label, env in MODES.items():
+        result = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.db_connections', '--child'],
+            env={**os.environ, **env}, capture_output=True, text=True,
+        )
+        if result.returncode:
+            print(f'{label}: failed\n{result.stderr}')
+            continue
+        numbers = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{label:30} {numbers['rps']:8.1f} requests/s  {numbers['connections']:5} connections opened")
+    return 0
+
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        sys.exit(harness.run(measure))
+    sys.exit(main())
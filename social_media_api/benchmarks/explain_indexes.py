@@ -0,0 +1,100 @@
+"""EXPLAIN the hot feed, comment and notification queries.
+
+Prints the plan for each query shape used by ``posts/views.py``,
+``posts/timeline.py`` and ``notifications/views.py`` and exits non-zero if a
+plan does not use the composite index added for it::
+
+    python -m benchmarks.explain_indexes
+
+Plans follow the planner statistics and a sequential scan is the right plan
+for a near-empty table, so ``seed()`` first fills the tables and runs ANALYZE.
+"""
+import sys
+
+from benchmarks import harness
+
+
+def seed():
+    """Fill the tables the hot queries read and refresh the planner statistics.
+
+    Many users each own a small share of the rows, timelines and comment
+    threads are long, and unread notifications are the rare case.
+    """
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+
+    from notifications.models import Notification
+    from posts.models import Comment, Post, TimelineEntry
+
+    users = get_user_model().objects.bulk_create(
+        get_user_model()(username=f'user{i}') for i in range(200)
+    )
+    posts = Post.objects.bulk_create(
+        Post(title=f'Post {i}', content='Content', author=users[i % 200]) for i in range(4000)
+    )
+    Comment.objects.bulk_create(
+        Comment(content='Comment', author=users[i % 200], post=posts[i % 40]) for i in range(4000)
+    )
+    TimelineEntry.objects.bulk_create(
+        TimelineEntry(user=users[i % 20], post=post, created_at=post.created_at)
+        for i, post in enumerate(posts)
+    )
+    Notification.objects.bulk_create(
+        Notification(recipient=users[i % 200], actor=users[0], verb='liked', read=i % 10 != 0)
+        for i in range(4000)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def hot_queries():
+    from django.utils import timezone
+
+    from notifications.models import Notification
+    from posts import timeline
+    from posts.models import Comment, Post
+
+    # A cursor past the first page of the feed.
+    position = (timezone.now(), 1)
+    return [
+        ('post list', 'posts_post_created_id',
+         Post.objects.order_by('-created_at', '-id')[:10]),
+        ('posts by author', 'posts_post_author_created',
+         Post.objects.filter(author_id=1).order_by('-created_at', '-id')[:10]),
+        ('comments by post', 'posts_comment_post_created',
+         Comment.objects.filter(post_id=1).order_by('created_at', 'id')[:10]),
+        ('home timeline', 'posts_timeline_user_created',
+         timeline.timeline_keys(1, 11)),
+        ('home timeline, next page', 'posts_timeline_user_created',
+         timeline.timeline_keys(1, 11, position)),
+        # One index range per author, then a top-N sort of those ranges.
+        ('celebrity posts in feed', 'posts_post_author_created',
+         timeline.celebrity_keys([1, 2], 11, position)),
+        ('notification list', 'notif_recipient_ts_id',
+         Notification.objects.filter(recipient_id=1).order_by('-timestamp', '-id')[:10]),
+        ('unread count / mark-read', 'notif_recipient_read_ts',
+         Notification.objects.filter(recipient_id=1, read=False).values('id')),
+    ]
+
+
+def check_plans():
+    """Return ``(label, index, plan, used)`` for every hot query."""
+    results = []
+    for label, index, queryset in hot_queries():
+        plan = queryset.explain()
+        results.append((label, index, plan, index in plan))
+    return results
+
+
+def main():
+    seed()
+    failures = 0
+    for label, index, plan, used in check_plans():
+        print(f"[{'ok' if used else 'MISSING'}] {label}: expects {index}")
+        print('    ' + plan.replace('\n', '\n    '))
+        failures += not used
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(harness.run(main))
@@ -0,0 +1,35 @@
+"""Shared setup for the benchmark scripts.
+
+Benchmarks run against freshly created test databases, the same way
+``manage.py test`` does, so they never read or write real data. Run them from
+the project directory, e.g. ``python -m benchmarks.explain_indexes``.
+"""
+import os
+import time
+
+import django
+
+
+def run(main):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_media_api.settings')
+    django.setup()
+
+    from django.test.runner import DiscoverRunner
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases()
+    try:
+        return main()
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+
+
+def timed(func, iterations):
+    """Call ``func`` ``iterations`` times and return the mean seconds per call."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
@@ -0,0 +1,73 @@
+"""Concurrent load test against a running server.
+
+Unlike the other benchmarks this does not set up Django: start the server in
+the mode you want to measure, then point the script at it::
+
+    SERVER_MODE=wsgi gunicorn &     # or SERVER_MODE=asgi
+    python -m benchmarks.load_test --token <key> --path /api/feed/ --concurrency 50
+
+Run it once per mode with the same data, workers and concurrency to compare
+them. Prints throughput, latency percentiles and the number of failures.
+"""
+import argparse
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def fetch(url, headers, timeout):
+    request = urllib.request.Request(url, headers=headers)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            ok = response.status < 400
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--path', action='append', dest='paths',
+                        help='Endpoint to request (repeatable, default /api/feed/).')
+    parser.add_argument('--token', help='Auth token; sent as "Token <key>" unless --bearer.')
+    parser.add_argument('--bearer', action='store_true', help='Send the token as a JWT bearer token.')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--timeout', type=float, default=30)
+    options = parser.parse_args(argv)
+
+    headers = {}
+    if options.token:
+        headers['Authorization'] = f"{'Bearer' if options.bearer else 'Token'} {options.token}"
+    paths = options.paths or ['/api/feed/']
+    urls = [options.base_url.rstrip('/') + paths[i % len(paths)] for i in range(options.requests)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options.concurrency) as executor:
+        results = list(executor.map(lambda url: fetch(url, headers, options.timeout), urls))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(seconds for ok, seconds in results if ok)
+    failures = sum(1 for ok, _ in results if not ok)
+    print(f'{len(results)} requests, concurrency {options.concurrency}, {elapsed:.2f}s')
+    print(f'throughput: {len(results) / elapsed:.1f} req/s, failures: {failures}')
+    if latencies:
+        print('latency ms: mean {:.1f}  p50 {:.1f}  p95 {:.1f}  p99 {:.1f}  max {:.1f}'.format(
+            statistics.mean(latencies) * 1000, percentile(latencies, 50) * 1000,
+            percentile(latencies, 95) * 1000, percentile(latencies, 99) * 1000, latencies[-1] * 1000,
+        ))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Logins per second through ``LoginView``.
+
+For each PBKDF2 iteration count, creates a user hashed with it and measures
+sequential logins through ``POST /api/login/`` (login throttling disabled),
+then hashing throughput when ``CONCURRENCY`` threads share the bounded
+hashing pool::
+
+    python -m benchmarks.login_throughput [iterations ...]
+
+The default compares Django's 1,000,000 iterations with a tuned 260,000.
+"""
+import sys
+import threading
+
+from benchmarks import harness
+
+LOGINS = 20
+CONCURRENCY = 8
+HASHES_PER_THREAD = 5
+
+
+def login_rate(client, username):
+    def login():
+        response = client.post('/api/login/', {'username': username, 'password': 'bench-pass-123'})
+        assert response.status_code == 200, response.status_code
+    return 1 / harness.timed(login, LOGINS)
+
+
+def pool_rate(user):
+    from accounts import passwords
+
+    def worker():
+        for _ in range(HASHES_PER_THREAD):
+            assert passwords.check_password(user, 'bench-pass-123')
+
+    threads = [threading.Thread(target=worker) for _ in range(CONCURRENCY)]
+    seconds = harness.timed(lambda: ([t.start() for t in threads], [t.join() for t in threads]), 1)
+    return CONCURRENCY * HASHES_PER_THREAD / seconds
+
+
+def main(iteration_counts):
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+    from accounts.views import LoginView
+
+    LoginView.throttle_classes = []
+    client = APIClient()
+    print(f'pool: {settings.PASSWORD_HASH_WORKERS} workers, {settings.PASSWORD_HASH_MAX_IN_FLIGHT} hashes in flight')
+    for iterations in iteration_counts:
+        with override_settings(PASSWORD_HASH_ITERATIONS=iterations):
+            user = get_user_model().objects.create_user(username=f'bench{iterations}', password='bench-pass-123')
+            print(f'{iterations:>9} iterations: {login_rate(client, user.username):7.1f} logins/s sequential, '
+                  f'{pool_rate(user):7.1f} hashes/s with {CONCURRENCY} threads')
+    return 0
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000000, 260000]
+    sys.exit(harness.run(lambda: main(counts)))
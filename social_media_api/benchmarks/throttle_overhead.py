@@ -0,0 +1,64 @@
+"""Per-request overhead of DRF's throttles vs the fixed-window throttles.
+
+Calls ``allow_request`` for one authenticated client that has already made
+at least ``HISTORY`` requests in the current window. Prints the mean time per
+call and the size of the value each throttle keeps in the cache::
+
+    python -m benchmarks.throttle_overhead
+
+The numbers use whatever cache ``CACHES`` configures; against Redis the
+history list also has to cross the network twice per request.
+"""
+import pickle
+import sys
+
+from benchmarks import harness
+
+HISTORY = 999
+ITERATIONS = 2000
+RATE = '1000000/day'
+
+
+def measure(throttle_class, request):
+    from django.core.cache import cache
+    from social_media_api import throttling
+
+    cache.clear()
+    throttle_class.THROTTLE_RATES = {**throttle_class.THROTTLE_RATES, 'user': RATE}
+
+    def allow():
+        assert throttle_class().allow_request(request, None)
+
+    for _ in range(HISTORY):
+        allow()
+    seconds = harness.timed(allow, ITERATIONS)
+    throttle = throttle_class()
+    throttle.allow_request(request, None)
+    key = throttle.key
+    if isinstance(throttle, throttling.FixedWindowRateThrottleMixin):
+        key = f'{key}:{int(throttle.timer() // throttle.duration)}'
+    return seconds, len(pickle.dumps(cache.get(key)))
+
+
+def main():
+    from django.contrib.auth import get_user_model
+    from rest_framework import throttling as drf_throttling
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from social_media_api import throttling
+
+    user = get_user_model().objects.create_user(username='bench', password='bench-pass-123')
+    request = Request(APIRequestFactory().get('/api/posts/'))
+    request.user = user
+
+    for label, throttle_class in (
+        ('rest_framework UserRateThrottle', drf_throttling.UserRateThrottle),
+        ('fixed-window UserRateThrottle', throttling.UserRateThrottle),
+    ):
+        seconds, size = measure(throttle_class, request)
+        print(f'{label:32} {seconds * 1e6:8.1f} us/request  {size:6} bytes cached')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(harness.run(main))
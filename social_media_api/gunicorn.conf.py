@@ -0,0 +1,24 @@
+"""Gunicorn configuration, picked up automatically from the project directory.
+
+``SERVER_MODE=wsgi`` (default) serves ``social_media_api.wsgi`` with sync
+workers. ``SERVER_MODE=asgi`` serves ``social_media_api.asgi`` with uvicorn
+workers, so the async views (feed, notifications, like, profile) free the
+worker while they wait on the database or cache.
+"""
+import multiprocessing
+import os
+
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+if SERVER_MODE not in ('wsgi', 'asgi'):
+    raise ValueError("SERVER_MODE must be 'wsgi' or 'asgi'")
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'social_media_api.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'social_media_api.wsgi:application'
+    worker_class = 'sync'
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+bind = '0.0.0.0:' + os.environ.get('PORT', '8000')
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
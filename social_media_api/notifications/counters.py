@@ -0,0 +1,45 @@
+"""Per-user unread notification counters kept in the cache.
+
+Counters are adjusted incrementally when notifications are delivered or
+marked read, and recomputed from the database when missing. The TTL bounds
+how long any drift can survive.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Notification
+
+UNREAD_TIMEOUT = 60 * 60
+
+
+def _key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def get_unread_count(user_id):
+    count = cache.get(_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, read=False).count()
+        cache.add(_key(user_id), count, UNREAD_TIMEOUT)
+    return count
+
+
+def _adjust(user_id, delta):
+    try:
+        if delta >= 0:
+            cache.incr(_key(user_id), delta)
+        elif cache.decr(_key(user_id), -delta) < 0:
+            cache.delete(_key(user_id))
+    except ValueError:
+        # Not cached: the next read recomputes it.
+        pass
+
+
+def adjust_unread(user_id, delta):
+    """Apply ``delta`` to a user's counter once the current transaction commits."""
+    if delta:
+        transaction.on_commit(lambda: _adjust(user_id, delta))
+
+
+def reset_unread(user_id):
+    transaction.on_commit(lambda: cache.set(_key(user_id), 0, UNREAD_TIMEOUT))
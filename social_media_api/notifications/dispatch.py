@@ -0,0 +1,91 @@
+"""Notification dispatch.
+
+Request handlers call ``notify()``. With ``NOTIFICATIONS_DISPATCH = 'outbox'``
+(the default) the event is written to the narrow ``PendingNotification``
+outbox and the ``process_notifications`` worker turns batches of events into
+``Notification`` rows with one ``bulk_create``. Events for the same recipient,
+verb and target inside a batch are coalesced into a single notification that
+records how many distinct actors it stands for. ``'inline'`` writes the
+notification immediately, which is handy for development. Either way, open
+notification streams are signalled once the notifications are committed.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from . import counters, pubsub
+from .models import Notification, PendingNotification
+
+
+def notify(recipient_id, actor_id, verb, target=None):
+    notify_many([(recipient_id, actor_id, verb, target)])
+
+
+def notify_many(events):
+    """Dispatch ``(recipient_id, actor_id, verb, target)`` events with one INSERT."""
+    rows = []
+    for recipient_id, actor_id, verb, target in events:
+        fields = {
+            'recipient_id': recipient_id,
+            'actor_id': actor_id,
+            'verb': verb,
+            'target_content_type': None,
+            'target_object_id': None,
+        }
+        if target is not None:
+            # get_for_model is served from ContentType's in-process cache.
+            fields['target_content_type'] = ContentType.objects.get_for_model(target)
+            fields['target_object_id'] = target.pk
+        rows.append(fields)
+    if not rows:
+        return
+
+    if settings.NOTIFICATIONS_DISPATCH == 'inline':
+        Notification.objects.bulk_create(Notification(**fields) for fields in rows)
+        recipients = Counter(fields['recipient_id'] for fields in rows)
+        for recipient_id, count in recipients.items():
+            counters.adjust_unread(recipient_id, count)
+        pubsub.publish(recipients)
+    else:
+        PendingNotification.objects.bulk_create(PendingNotification(**fields) for fields in rows)
+
+
+def coalesce(events):
+    """Collapse pending events into unsaved notifications, newest actor first."""
+    groups = {}
+    for event in events:
+        key = (event.recipient_id, event.verb, event.target_content_type_id, event.target_object_id)
+        groups.setdefault(key, []).append(event)
+
+    notifications = []
+    for (recipient_id, verb, content_type_id, object_id), grouped in groups.items():
+        notifications.append(Notification(
+            recipient_id=recipient_id,
+            actor_id=grouped[-1].actor_id,
+            verb=verb,
+            target_content_type_id=content_type_id,
+            target_object_id=object_id,
+            actor_count=len({event.actor_id for event in grouped}),
+        ))
+    return notifications
+
+
+def drain(batch_size=500):
+    """Deliver one batch from the outbox. Returns the number of events consumed."""
+    with transaction.atomic():
+        events = list(
+            PendingNotification.objects
+            .select_for_update(skip_locked=True)
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+        notifications = Notification.objects.bulk_create(coalesce(events))
+        recipients = Counter(n.recipient_id for n in notifications)
+        for recipient_id, count in recipients.items():
+            counters.adjust_unread(recipient_id, count)
+        pubsub.publish(recipients)
+        PendingNotification.objects.filter(id__in=[event.id for event in events]).delete()
+    return len(events)
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications import retention
+
+
+class Command(BaseCommand):
+    help = 'Move read notifications older than the retention window into the archive table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Archive read notifications older than this many days '
+                                 '(default: NOTIFICATIONS_RETENTION_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Maximum number of notifications moved per transaction.')
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to pause between batches to spread the load.')
+
+    def handle(self, *args, **options):
+        before = retention.cutoff(options['days'])
+        total = 0
+        while True:
+            moved = retention.archive_batch(before, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f'Archived {total} notification(s)...')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {total} read notification(s) older than {before:%Y-%m-%d %H:%M}.'
+        ))
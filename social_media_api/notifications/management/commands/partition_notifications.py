@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from notifications import retention
+
+
+class Command(BaseCommand):
+    help = ('Partition the notifications table by month on PostgreSQL, keep future partitions '
+            'created and drop archived ones. Run it monthly.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database alias to partition (default: "default").')
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Number of future monthly partitions to keep created.')
+        parser.add_argument('--convert', action='store_true',
+                            help='Rebuild an unpartitioned table as a partitioned one. '
+                                 'Locks the table while it copies the rows.')
+        parser.add_argument('--days', type=int, default=None,
+                            help='Retention window for dropping empty partitions '
+                                 '(default: NOTIFICATIONS_RETENTION_DAYS).')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError(f'Partitioning needs PostgreSQL, not {connection.vendor}.')
+
+        if not retention.is_partitioned(connection):
+            if not options['convert']:
+                raise CommandError('The notifications table is not partitioned yet; rerun with --convert.')
+            retention.convert_to_partitioned(connection, options['months_ahead'])
+            self.stdout.write('Converted the notifications table to monthly partitions.')
+
+        created = retention.ensure_partitions(connection, options['months_ahead'])
+        dropped = retention.drop_expired_partitions(connection, retention.cutoff(options['days']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(created)} and dropped {len(dropped)} notification partition(s).'
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications import dispatch
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notifications from the outbox in coalesced batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Maximum number of outbox events per batch.')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to sleep when the outbox is empty.')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the outbox and exit instead of polling forever.')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            consumed = dispatch.drain(options['batch_size'])
+            total += consumed
+            if consumed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Delivered {total} queued event(s).'))
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.conf import settings
 
@@ -11,10 +12,58 @@ class Notification(models.Model):
     target_content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE, null=True, blank=True)
     target_object = GenericForeignKey('target_content_type', 'target_object_id')
     read = models.BooleanField(default=False)
+    # Number of distinct actors coalesced into this notification ("X and N others").
+    actor_count = models.PositiveIntegerField(default=1)
 
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Notification list and keyset pages for one recipient.
+            models.Index(fields=['recipient', '-timestamp', '-id'], name='notif_recipient_ts_id'),
+            # Unread counts and mark-read.
+            models.Index(fields=['recipient', 'read', '-timestamp'], name='notif_recipient_read_ts'),
+            # Read notifications past retention, for archive_notifications.
+            models.Index(fields=['timestamp'], condition=Q(read=True), name='notif_read_ts'),
+        ]
 
     def __str__(self):
         return f"{self.actor.username} {self.verb} {self.recipient.username}"
-    
\ No newline at end of file
+
+
+class ArchivedNotification(models.Model):
+    """A read notification moved out of the live table by ``archive_notifications``.
+
+    Keeps the original ID, so archiving the same row twice is harmless.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    verb = models.CharField(max_length=255)
+    target_object_id = models.PositiveIntegerField(null=True, blank=True)
+    target_content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    read = models.BooleanField(default=True)
+    actor_count = models.PositiveIntegerField(default=1)
+    timestamp = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', '-timestamp'], name='notif_archive_recipient_ts'),
+        ]
+
+    def __str__(self):
+        return f"{self.actor_id} {self.verb} {self.recipient_id} (archived)"
+
+
+class PendingNotification(models.Model):
+    """A notification event waiting in the outbox for the dispatch worker."""
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    verb = models.CharField(max_length=255)
+    target_object_id = models.PositiveIntegerField(null=True, blank=True)
+    target_content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.actor_id} {self.verb} {self.recipient_id} (pending)"
@@ -0,0 +1,149 @@
+"""Wake-up signals for open notification streams.
+
+A message only says "user N has new notifications"; the stream then reads
+the rows after its last event ID from the database. Missed or duplicated
+signals therefore cost at most one extra indexed query, and a periodic
+heartbeat re-check bounds the delay if a signal is lost.
+
+``NOTIFICATIONS_PUBSUB = 'memory'`` delivers signals within the process
+that created the notifications, which is enough for a single server with
+``NOTIFICATIONS_DISPATCH = 'inline'``. ``'redis'`` publishes them on a Redis
+channel so that streams in every web process hear about notifications written
+by any process, including the ``process_notifications`` worker.
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.db import transaction
+
+REDIS_CHANNEL = 'notifications:stream'
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One open stream waiting for signals for one user."""
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def notify(self):
+        # Called from whichever thread published the signal.
+        self.loop.call_soon_threadsafe(self._event.set)
+
+    async def wait(self, timeout):
+        """Wait for a signal. Returns False if ``timeout`` seconds passed without one."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class MemoryBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def deliver(self, user_ids):
+        """Wake the local streams of ``user_ids``."""
+        with self._lock:
+            subscriptions = [s for user_id in user_ids for s in self._subscriptions.get(user_id, ())]
+        for subscription in subscriptions:
+            subscription.notify()
+
+    def publish(self, user_ids):
+        self.deliver(user_ids)
+
+
+class RedisBroker(MemoryBroker):
+    """Fans signals out through one Redis channel.
+
+    Each process keeps a single subscriber connection per event loop, started
+    with the first stream, and wakes its local streams from it.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        self.url = url
+        self._client = None
+        self._listeners = {}
+
+    def _sync_client(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def publish(self, user_ids):
+        try:
+            self._sync_client().publish(REDIS_CHANNEL, ','.join(str(user_id) for user_id in user_ids))
+        except redis.RedisError:
+            # Streams still pick the notifications up on their next heartbeat.
+            logger.warning('Could not publish notification signal', exc_info=True)
+
+    def subscribe(self, user_id):
+        subscription = super().subscribe(user_id)
+        loop = subscription.loop
+        with self._lock:
+            listener = self._listeners.get(loop)
+            if listener is None or listener.done():
+                self._listeners[loop] = loop.create_task(self._listen())
+        return subscription
+
+    async def _listen(self):
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(REDIS_CHANNEL)
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    self.deliver([int(user_id) for user_id in message['data'].split(b',')])
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        if settings.NOTIFICATIONS_PUBSUB == 'redis':
+            _broker = RedisBroker(settings.NOTIFICATIONS_PUBSUB_URL)
+        else:
+            _broker = MemoryBroker()
+    return _broker
+
+
+def publish(user_ids):
+    """Signal ``user_ids`` once the current transaction commits."""
+    user_ids = sorted(set(user_ids))
+    if user_ids:
+        transaction.on_commit(lambda: get_broker().publish(user_ids))
@@ -0,0 +1,222 @@
+"""Retention for the notifications table.
+
+Read notifications older than ``NOTIFICATIONS_RETENTION_DAYS`` are moved to
+``ArchivedNotification`` in small batches, each in its own transaction, so
+the live table (and every recipient's list) only holds recent and unread
+rows. Unread notifications are never archived, so unread counters are
+unaffected.
+
+On PostgreSQL the live table can also be partitioned by month (see
+``partition_notifications``); partitions that fall out of the retention
+window and have been fully archived are then dropped instead of vacuumed.
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedNotification, Notification
+
+ARCHIVED_FIELDS = [
+    field.attname for field in ArchivedNotification._meta.concrete_fields if field.attname != 'archived_at'
+]
+
+
+def cutoff(days=None):
+    if days is None:
+        days = settings.NOTIFICATIONS_RETENTION_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_batch(before, batch_size=1000):
+    """Move up to ``batch_size`` read notifications older than ``before``. Returns how many moved."""
+    with transaction.atomic():
+        rows = list(
+            Notification.objects.filter(read=True, timestamp__lt=before)
+            .order_by('timestamp')
+            # Concurrent runs take different rows instead of waiting.
+            .select_for_update(skip_locked=True)
+            .values(*ARCHIVED_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        # ignore_conflicts: a row archived by an earlier, interrupted run is already there.
+        ArchivedNotification.objects.bulk_create(
+            [ArchivedNotification(**row) for row in rows], ignore_conflicts=True
+        )
+        Notification.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+# PostgreSQL partitioning ---------------------------------------------------
+
+TABLE = Notification._meta.db_table
+SEQUENCE = f'{TABLE}_pk_seq'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def _month(day):
+    return date(day.year, day.month, 1)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _months_from_now(months):
+    month = _month(timezone.now().date())
+    for _ in range(months):
+        month = _next_month(month)
+    return month
+
+
+def _start(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _partition_name(month):
+    return f'{TABLE}_y{month.year}m{month.month:02d}'
+
+
+def is_partitioned(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))', [TABLE]
+        )
+        return cursor.fetchone()[0]
+
+
+def _create_partition(connection, name, month):
+    quote = connection.ops.quote_name
+    start, end = _start(month), _start(_next_month(month))
+    # Bounds are generated dates, not user input; DDL cannot take parameters.
+    create = (
+        f"CREATE TABLE {quote(name)} PARTITION OF {quote(TABLE)} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [DEFAULT_PARTITION])
+        stranded = False
+        if cursor.fetchone()[0]:
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM {quote(DEFAULT_PARTITION)} '
+                f'WHERE "timestamp" >= %s AND "timestamp" < %s)',
+                [start, end],
+            )
+            stranded = cursor.fetchone()[0]
+        if not stranded:
+            cursor.execute(create)
+            return
+        # PostgreSQL refuses to create a partition while the default one holds
+        # rows for its range: detach the default, move those rows into the new
+        # partition and attach it again.
+        with transaction.atomic(using=connection.alias):
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(DEFAULT_PARTITION)}')
+            cursor.execute(create)
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} '
+                f'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                f'INSERT INTO {quote(name)} SELECT * FROM moved',
+                [start, end],
+            )
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(DEFAULT_PARTITION)} DEFAULT')
+
+
+def create_partitions(connection, first, last):
+    """Create the monthly partitions from ``first`` to ``last`` (inclusive) that are missing.
+
+    Rows of those months that had landed in the default partition are moved
+    into the new partitions.
+    """
+    month = _month(first)
+    created = []
+    with connection.cursor() as cursor:
+        while month <= last:
+            name = _partition_name(month)
+            cursor.execute('SELECT to_regclass(%s) IS NULL', [name])
+            if cursor.fetchone()[0]:
+                _create_partition(connection, name, month)
+                created.append(name)
+            month = _next_month(month)
+    return created
+
+
+def ensure_partitions(connection, months_ahead):
+    """Create this month's partition and the next ``months_ahead``, so new rows never land in the default."""
+    return create_partitions(connection, timezone.now().date(), _months_from_now(months_ahead))
+
+
+def drop_expired_partitions(connection, before):
+    """Drop monthly partitions that end before ``before`` and hold no rows. Returns their names."""
+    quote = connection.ops.quote_name
+    dropped = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY child.relname',
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+        for name in names:
+            suffix = name[len(TABLE):]
+            if not suffix.startswith('_y'):
+                continue  # The default partition.
+            month = date(int(suffix[2:6]), int(suffix[7:9]), 1)
+            if _start(_next_month(month)) > before:
+                continue
+            cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {quote(name)})')
+            if not cursor.fetchone()[0]:
+                cursor.execute(f'DROP TABLE {quote(name)}')
+                dropped.append(name)
+    return dropped
+
+
+def convert_to_partitioned(connection, months_ahead):
+    """Rebuild the notifications table as a table partitioned by month of ``timestamp``.
+
+    Copies every row while holding an exclusive lock, so run it in a
+    maintenance window (or after archiving, when the table is small).
+    PostgreSQL requires the partition key in the primary key, which becomes
+    ``(id, timestamp)``; IDs still come from one sequence and stay unique.
+    """
+    quote = connection.ops.quote_name
+    old = f'{TABLE}_unpartitioned'
+    with transaction.atomic(using=connection.alias), connection.schema_editor(atomic=False) as editor:
+        editor.execute(f'LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT MIN("timestamp") FROM {quote(TABLE)}')
+            oldest = cursor.fetchone()[0] or timezone.now()
+        editor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(old)}')
+        editor.execute(
+            f'CREATE TABLE {quote(TABLE)} (LIKE {quote(old)} INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")'
+        )
+        # Identity columns cannot be declared on a partitioned table before
+        # PostgreSQL 17, so IDs come from an explicitly owned sequence.
+        editor.execute(f'CREATE SEQUENCE {quote(SEQUENCE)} OWNED BY {quote(TABLE)}."id"')
+        editor.execute(f"ALTER TABLE {quote(TABLE)} ALTER COLUMN \"id\" SET DEFAULT nextval('{SEQUENCE}')")
+        editor.execute(f'ALTER TABLE {quote(TABLE)} ADD PRIMARY KEY ("id", "timestamp")')
+        editor.execute(f'CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(TABLE)} DEFAULT')
+        create_partitions(connection, oldest.date(), _months_from_now(months_ahead))
+
+        editor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(old)}')
+        editor.execute(
+            f"SELECT setval('{SEQUENCE}', (SELECT COALESCE(MAX(\"id\"), 0) + 1 FROM {quote(TABLE)}), false)"
+        )
+        editor.execute(f'DROP TABLE {quote(old)}')
+
+        # Indexes and foreign keys are declared on the parent and cascade to
+        # every partition, including ones created later.
+        for index in Notification._meta.indexes:
+            editor.execute(index.create_sql(Notification, editor))
+        for field in Notification._meta.local_concrete_fields:
+            if field.remote_field is None:
+                continue
+            target = field.target_field
+            editor.execute(f'CREATE INDEX ON {quote(TABLE)} ({quote(field.column)})')
+            editor.execute(
+                f'ALTER TABLE {quote(TABLE)} ADD FOREIGN KEY ({quote(field.column)}) '
+                f'REFERENCES {quote(target.model._meta.db_table)} ({quote(target.column)}) '
+                f'DEFERRABLE INITIALLY DEFERRED'
+            )
@@ -1,9 +1,64 @@
 from rest_framework import serializers
+from . import targets
 from .models import Notification
 
+
+class TargetField(serializers.Field):
+    """Summary of the notification's target, e.g. ``{"type": "post", "id": 1, "title": ...}``.
+
+    ``None`` when there is no target or it was deleted. Lists resolve the
+    targets of a whole page at once (see ``NotificationListSerializer``).
+    """
+    # Columns read from the notification, for QueryShapingMixin's only().
+    only_fields = ('target_content_type', 'target_object_id')
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, notification):
+        key = (notification.target_content_type_id, notification.target_object_id)
+        summaries = self.parent.target_summaries
+        if summaries is None:
+            summaries = targets.summarize([key])
+        return summaries.get(key)
+
+
+class NotificationListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Resolve the targets for the whole page in one query per target type.
+        notifications = list(data.all() if hasattr(data, 'all') else data)
+        self.child.target_summaries = targets.summarize(
+            (n.target_content_type_id, n.target_object_id) for n in notifications
+        )
+        return super().to_representation(notifications)
+
+
 class NotificationSerializer(serializers.ModelSerializer):
     actor_username = serializers.CharField(source='actor.username', read_only=True)
-    
+    target = TargetField()
+
     class Meta:
         model = Notification
-        fields = ['id', 'actor_username', 'verb', 'timestamp', 'read']
\ No newline at end of file
+        fields = ['id', 'actor_username', 'actor_count', 'verb', 'target', 'timestamp', 'read']
+        select_related = ['actor']
+        list_serializer_class = NotificationListSerializer
+
+    target_summaries = None
+
+
+class GroupedNotificationSerializer(serializers.Serializer):
+    verb = serializers.CharField()
+    target_content_type = serializers.IntegerField(allow_null=True)
+    target_object_id = serializers.IntegerField(allow_null=True)
+    target = serializers.DictField(allow_null=True)
+    count = serializers.IntegerField()
+    actor_count = serializers.IntegerField()
+    unread_count = serializers.IntegerField()
+    latest_timestamp = serializers.DateTimeField()
+    latest_actor_username = serializers.CharField(allow_null=True)
+
+
+class MarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
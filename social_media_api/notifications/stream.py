@@ -0,0 +1,113 @@
+"""Server-Sent Events stream of a user's notifications.
+
+Each event carries one ``NotificationSerializer`` payload with the
+notification ID as the SSE event ID, so a reconnecting ``EventSource`` sends
+``Last-Event-ID`` and the stream replays whatever it missed from the
+database before waiting for new signals.
+"""
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import pubsub
+from .models import Notification
+from .serializers import NotificationSerializer
+
+# Most notifications sent in one wake-up; the rest follow immediately after.
+BATCH_SIZE = 100
+RETRY_MILLISECONDS = 3000
+
+
+def opening_frame(latest=None):
+    """The first frame of a stream: the reconnect delay, and where to resume from.
+
+    A new stream (no ``Last-Event-ID``) passes the newest notification ID. An
+    ``id`` field without data dispatches nothing but still sets the client's
+    ``Last-Event-ID``, so a stream that ends before any notification arrives
+    resumes from there instead of skipping what was created meanwhile.
+    """
+    if latest is None:
+        return f'retry: {RETRY_MILLISECONDS}\n\n'
+    return f'retry: {RETRY_MILLISECONDS}\nid: {latest}\n\n'
+
+
+def format_event(payload):
+    data = json.dumps(payload, cls=DjangoJSONEncoder)
+    return f"id: {payload['id']}\nevent: notification\ndata: {data}\n\n"
+
+
+def latest_id(user_id):
+    return Notification.objects.filter(recipient_id=user_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def fetch_since(user_id, last_id):
+    notifications = (
+        Notification.objects
+        .filter(recipient_id=user_id, id__gt=last_id)
+        .select_related('actor')
+        .order_by('id')[:BATCH_SIZE]
+    )
+    return NotificationSerializer(notifications, many=True).data
+
+
+def backlog(user_id, last_id):
+    """Yield SSE frames for the notifications after ``last_id``, then stop.
+
+    Used under WSGI, where a response cannot wait for new notifications
+    without holding a worker; ``EventSource`` reconnects after the retry
+    delay and resumes from the last event ID.
+    """
+    if last_id is None:
+        yield opening_frame(latest_id(user_id))
+        return
+    yield opening_frame()
+    while True:
+        batch = fetch_since(user_id, last_id)
+        for payload in batch:
+            yield format_event(payload)
+        if len(batch) < BATCH_SIZE:
+            return
+        last_id = batch[-1]['id']
+
+
+async def replay(user_id, last_id):
+    """Yield every notification payload after ``last_id``, oldest first."""
+    while True:
+        batch = await sync_to_async(fetch_since)(user_id, last_id)
+        for payload in batch:
+            yield payload
+        if len(batch) < BATCH_SIZE:
+            return
+        last_id = batch[-1]['id']
+
+
+async def events(user_id, last_id):
+    """Yield SSE frames for ``user_id`` starting after notification ``last_id``.
+
+    Replays the backlog, then waits for new notifications, sending a comment
+    every ``NOTIFICATIONS_STREAM_HEARTBEAT`` seconds to keep proxies from
+    closing the connection. Ends after ``NOTIFICATIONS_STREAM_MAX_SECONDS``
+    so clients reconnect (and resume) through a fresh request.
+    """
+    # Subscribe before reading so a notification created in between still wakes us.
+    subscription = pubsub.get_broker().subscribe(user_id)
+    try:
+        if last_id is None:
+            last_id = await sync_to_async(latest_id)(user_id)
+            yield opening_frame(last_id)
+        else:
+            yield opening_frame()
+        deadline = time.monotonic() + settings.NOTIFICATIONS_STREAM_MAX_SECONDS
+        while True:
+            async for payload in replay(user_id, last_id):
+                last_id = payload['id']
+                yield format_event(payload)
+            if time.monotonic() >= deadline:
+                return
+            if not await subscription.wait(settings.NOTIFICATIONS_STREAM_HEARTBEAT):
+                yield ': keepalive\n\n'
+    finally:
+        subscription.close()
@@ -0,0 +1,50 @@
+"""Batched resolution of notification targets.
+
+``Notification.target_object`` is a ``GenericForeignKey``: reading it on each
+row of a page costs a query per row. ``resolve()`` instead groups the
+``(content type, object id)`` pairs of a whole page and loads each content
+type with a single ``in_bulk()``, so rendering targets costs one query per
+target type no matter how long the page is. Content types come from
+``ContentType``'s in-process cache and never hit the database after the
+first lookup.
+"""
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+
+# Columns to load and the summary to render, per target model. Other models
+# are summarized by type and ID only.
+SUMMARIES = {
+    'posts.post': (('id', 'title'), lambda post: {'title': post.title}),
+}
+
+
+def _summary_spec(model):
+    return SUMMARIES.get(model._meta.label_lower, ((model._meta.pk.name,), lambda obj: {}))
+
+
+def resolve(pairs):
+    """Return ``{(content_type_id, object_id): object}`` for the targets that still exist."""
+    ids_by_type = defaultdict(set)
+    for content_type_id, object_id in pairs:
+        if content_type_id is not None and object_id is not None:
+            ids_by_type[content_type_id].add(object_id)
+
+    objects = {}
+    for content_type_id, ids in ids_by_type.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is None:
+            continue  # The model was removed; treat its targets as deleted.
+        fields, _ = _summary_spec(model)
+        found = model._default_manager.only(*fields).in_bulk(ids)
+        objects.update(((content_type_id, pk), obj) for pk, obj in found.items())
+    return objects
+
+
+def summarize(pairs):
+    """Return ``{(content_type_id, object_id): summary}``; deleted targets are left out."""
+    summaries = {}
+    for key, obj in resolve(pairs).items():
+        _, summarize_object = _summary_spec(type(obj))
+        summaries[key] = {'type': obj._meta.model_name, 'id': obj.pk, **summarize_object(obj)}
+    return summaries
@@ -1,3 +1,310 @@
-from django.test import TestCase
+import asyncio
+import re
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from posts.models import Post
+from . import dispatch, pubsub, retention, stream
+from .models import ArchivedNotification, Notification, PendingNotification
 
-# Create your tests here.
+User = get_user_model()
+
+
+class NotificationAPITest(APITestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient', password='testpass123')
+        self.actor = User.objects.create_user(username='actor', password='testpass123')
+        Notification.objects.bulk_create(
+            Notification(recipient=self.recipient, actor=self.actor, verb='liked your post') for _ in range(15)
+        )
+        self.client.force_authenticate(user=self.recipient)
+
+    def test_list_notifications(self):
+        response = self.client.get(reverse('notifications-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 15)
+
+    def test_keyset_pagination(self):
+        first = self.client.get(reverse('notifications-list'), {'pagination': 'cursor'})
+        self.assertNotIn('count', first.data)
+        second = self.client.get(first.data['next'])
+        ids = [n['id'] for n in first.data['results'] + second.data['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(set(ids)), 15)
+        self.assertIsNone(second.data['next'])
+
+
+
+class NotificationDispatchTest(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.post = Post.objects.create(title='Test Post', content='Test content', author=self.author)
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='testpass123') for i in range(3)]
+
+    def like(self, user):
+        self.client.force_authenticate(user=user)
+        self.client.post(reverse('like-post', kwargs={'pk': self.post.pk}))
+
+    def test_likes_are_queued_and_coalesced(self):
+        for fan in self.fans:
+            self.like(fan)
+        self.like(self.author)
+        self.assertEqual(PendingNotification.objects.count(), 3)
+        self.assertFalse(Notification.objects.exists())
+
+        call_command('process_notifications', '--once', stdout=StringIO())
+
+        self.assertFalse(PendingNotification.objects.exists())
+        notification = Notification.objects.get()
+        self.assertEqual(notification.recipient, self.author)
+        self.assertEqual(notification.actor, self.fans[-1])
+        self.assertEqual(notification.actor_count, 3)
+        self.assertEqual(notification.target_object, self.post)
+
+    @override_settings(NOTIFICATIONS_DISPATCH='inline')
+    def test_inline_dispatch(self):
+        self.like(self.fans[0])
+        self.assertFalse(PendingNotification.objects.exists())
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 1)
+
+
+
+class NotificationGroupingTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.recipient = User.objects.create_user(username='recipient', password='testpass123')
+        self.post = Post.objects.create(title='Test Post', content='Test content', author=self.recipient)
+        self.actors = [User.objects.create_user(username=f'actor{i}', password='testpass123') for i in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            for actor in self.actors:
+                self.client.force_authenticate(user=actor)
+                self.client.post(reverse('like-post', kwargs={'pk': self.post.pk}))
+            call_command('process_notifications', '--once', '--batch-size', '1', stdout=StringIO())
+        Notification.objects.create(recipient=self.recipient, actor=self.actors[0], verb='followed you')
+        self.client.force_authenticate(user=self.recipient)
+
+    def test_grouped(self):
+        response = self.client.get(reverse('notifications-grouped'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        likes = next(group for group in response.data['results'] if group['verb'] == 'liked your post')
+        self.assertEqual(likes['count'], 3)
+        self.assertEqual(likes['unread_count'], 3)
+        self.assertEqual(likes['latest_actor_username'], 'actor2')
+        self.assertEqual(likes['target_object_id'], self.post.pk)
+
+    def test_unread_counter_tracks_deliveries_and_mark_read(self):
+        url = reverse('notifications-unread-count')
+        self.assertEqual(self.client.get(url).data['unread_count'], 4)
+
+        first = Notification.objects.filter(verb='liked your post').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('notifications-mark-read'), {'ids': [first.id, first.id]}, format='json')
+        self.assertEqual(response.data['marked_read'], 1)
+        self.assertEqual(self.client.get(url).data['unread_count'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('notifications-mark-read'), {}, format='json')
+        self.assertEqual(response.data['marked_read'], 3)
+        self.assertEqual(self.client.get(url).data['unread_count'], 0)
+        self.assertFalse(Notification.objects.filter(read=False).exists())
+
+
+
+class NotificationTargetTest(APITestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient', password='testpass123')
+        self.actor = User.objects.create_user(username='actor', password='testpass123')
+        self.posts = [
+            Post.objects.create(title=f'Post {i}', content='Test content', author=self.recipient) for i in range(4)
+        ]
+        for post in self.posts:
+            Notification.objects.create(recipient=self.recipient, actor=self.actor, verb='liked your post', target_object=post)
+        Notification.objects.create(recipient=self.recipient, actor=self.actor, verb='followed you')
+        self.client.force_authenticate(user=self.recipient)
+
+    def test_list_resolves_targets_per_page(self):
+        self.posts[0].delete()
+        # Count, page, and one in_bulk() for all the posts.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('notifications-list'))
+        results = {n['id']: n['target'] for n in response.data['results']}
+        post = self.posts[1]
+        self.assertIn({'type': 'post', 'id': post.id, 'title': post.title}, results.values())
+        # One for the untargeted notification, one for the deleted post.
+        self.assertEqual(list(results.values()).count(None), 2)
+
+    def test_retrieve_and_grouped_include_target(self):
+        notification = Notification.objects.get(target_object_id=self.posts[2].id)
+        response = self.client.get(reverse('notifications-detail', kwargs={'pk': notification.pk}))
+        self.assertEqual(response.data['target']['title'], 'Post 2')
+
+        response = self.client.get(reverse('notifications-grouped'))
+        titles = {group['target']['title'] for group in response.data['results'] if group['target']}
+        self.assertEqual(titles, {post.title for post in self.posts})
+
+
+class NotificationStreamTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.recipient = User.objects.create_user(username='recipient', password='testpass123')
+        self.actor = User.objects.create_user(username='actor', password='testpass123')
+        self.ids = [
+            Notification.objects.create(recipient=self.recipient, actor=self.actor, verb='followed you').id
+            for _ in range(3)
+        ]
+        self.client.force_authenticate(user=self.recipient)
+
+    def read_stream(self, **extra):
+        response = self.client.get(reverse('notification-stream'), HTTP_ACCEPT='text/event-stream', **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return b''.join(response).decode()
+
+    def test_replays_after_last_event_id(self):
+        # The sync test client is WSGI, so only the backlog is sent.
+        body = self.read_stream(HTTP_LAST_EVENT_ID=str(self.ids[0]))
+        self.assertTrue(body.startswith('retry: '))
+        self.assertNotIn(f'id: {self.ids[0]}\n', body)
+        self.assertIn(f'id: {self.ids[1]}\nevent: notification\n', body)
+        self.assertIn(f'id: {self.ids[2]}\n', body)
+
+    def test_reconnect_receives_new_notifications(self):
+        body = self.read_stream()
+        self.assertNotIn('event: notification', body)
+        # What EventSource sends back as Last-Event-ID when it reconnects.
+        last_event_id = re.findall(r'^id: (\d+)$', body, re.MULTILINE)[-1]
+        new_id = Notification.objects.create(recipient=self.recipient, actor=self.actor, verb='liked your post').id
+
+        body = self.read_stream(HTTP_LAST_EVENT_ID=last_event_id)
+        self.assertIn(f'id: {new_id}\nevent: notification\n', body)
+        self.assertNotIn(f'id: {self.ids[-1]}\nevent: notification\n', body)
+
+    def test_invalid_last_event_id(self):
+        response = self.client.get(reverse('notification-stream'), {'last_event_id': 'abc'}, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(NOTIFICATIONS_STREAM_MAX_SECONDS=0)
+    async def test_asgi_stream(self):
+        token = await Token.objects.acreate(user=self.recipient)
+        response = await self.async_client.get(
+            reverse('notification-stream'),
+            headers={'Authorization': 'Token ' + token.key, 'Accept': 'text/event-stream', 'Last-Event-ID': str(self.ids[1])},
+        )
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn(f'id: {self.ids[2]}\n', body)
+        self.assertNotIn(f'id: {self.ids[1]}\n', body)
+
+    def dispatch_inline(self):
+        with self.settings(NOTIFICATIONS_DISPATCH='inline'), self.captureOnCommitCallbacks(execute=True):
+            dispatch.notify(self.recipient.id, self.actor.id, 'liked your post')
+        return Notification.objects.latest('id').id
+
+    # Inline dispatch in this process; deployments with the outbox worker use Redis.
+    @mock.patch.object(pubsub, '_broker', new_callable=pubsub.MemoryBroker)
+    async def test_live_stream_wakes_on_dispatch(self, broker):
+        events = stream.events(self.recipient.id, None)
+        self.assertEqual(await anext(events), f'retry: {stream.RETRY_MILLISECONDS}\nid: {self.ids[-1]}\n\n')
+        pending = asyncio.ensure_future(anext(events))
+        # Let the stream reach its wait before the notification is written.
+        await asyncio.sleep(0.1)
+        self.assertFalse(pending.done())
+        new_id = await sync_to_async(self.dispatch_inline)()
+        frame = await asyncio.wait_for(pending, 5)
+        self.assertTrue(frame.startswith(f'id: {new_id}\n'))
+        await events.aclose()
+        self.assertFalse(broker._subscriptions)
+
+
+
+class NotificationRetentionTest(APITestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient', password='testpass123')
+        self.actor = User.objects.create_user(username='actor', password='testpass123')
+        Notification.objects.bulk_create(
+            Notification(recipient=self.recipient, actor=self.actor, verb='liked your post', read=read)
+            for read in [True] * 5 + [False] * 2
+        )
+        old = timezone.now() - timedelta(days=100)
+        Notification.objects.update(timestamp=old)
+        self.recent = Notification.objects.create(recipient=self.recipient, actor=self.actor, verb='followed you', read=True)
+
+    def test_archives_old_read_notifications_in_batches(self):
+        out = StringIO()
+        call_command('archive_notifications', '--days', '90', '--batch-size', '2', stdout=out)
+        self.assertIn('Archived 5 read notification(s)', out.getvalue())
+        self.assertEqual(ArchivedNotification.objects.count(), 5)
+        # Unread and recent notifications stay in the live table.
+        self.assertEqual(Notification.objects.filter(read=False).count(), 2)
+        self.assertTrue(Notification.objects.filter(id=self.recent.id).exists())
+        self.assertEqual(Notification.objects.count(), 3)
+
+        archived = ArchivedNotification.objects.first()
+        self.assertEqual((archived.recipient_id, archived.verb), (self.recipient.id, 'liked your post'))
+
+        call_command('archive_notifications', '--days', '90', stdout=StringIO())
+        self.assertEqual(ArchivedNotification.objects.count(), 5)
+
+    def test_partitioning_requires_postgres(self):
+        if connection.vendor == 'postgresql':
+            self.skipTest('Covered by NotificationPartitionTest.')
+        with self.assertRaises(CommandError):
+            call_command('partition_notifications', stdout=StringIO())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitioning needs PostgreSQL.')
+class NotificationPartitionTest(APITestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient', password='testpass123')
+        self.actor = User.objects.create_user(username='actor', password='testpass123')
+        self.ids = [
+            Notification.objects.create(recipient=self.recipient, actor=self.actor, verb='followed you').id
+            for _ in range(3)
+        ]
+        Notification.objects.filter(id=self.ids[0]).update(timestamp=timezone.now() - timedelta(days=100))
+        with connection.cursor() as cursor:
+            # Run the deferred foreign key checks of these uncommitted rows now;
+            # the table they sit in cannot be dropped while they are pending.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+    def partition_of(self, notification_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text FROM {retention.TABLE} WHERE id = %s', [notification_id])
+            return cursor.fetchone()[0]
+
+    def test_convert_keeps_rows_and_ids(self):
+        call_command('partition_notifications', '--convert', stdout=StringIO())
+        self.assertTrue(retention.is_partitioned(connection))
+        self.assertEqual(list(Notification.objects.order_by('id').values_list('id', flat=True)), self.ids)
+        old = Notification.objects.get(id=self.ids[0])
+        self.assertEqual(self.partition_of(old.id), retention._partition_name(old.timestamp.date()))
+
+        new = Notification.objects.create(recipient=self.recipient, actor=self.actor, verb='liked your post')
+        self.assertGreater(new.id, self.ids[-1])
+        self.assertEqual(self.partition_of(new.id), retention._partition_name(timezone.now().date()))
+
+    def test_new_partition_takes_rows_from_the_default(self):
+        call_command('partition_notifications', '--convert', stdout=StringIO())
+        later = timezone.now() + timedelta(days=365)
+        stray = Notification.objects.create(recipient=self.recipient, actor=self.actor, verb='followed you')
+        Notification.objects.filter(id=stray.id).update(timestamp=later)
+        self.assertEqual(self.partition_of(stray.id), retention.DEFAULT_PARTITION)
+
+        self.assertEqual(retention.create_partitions(connection, later.date(), later.date()),
+                         [retention._partition_name(later.date())])
+        self.assertEqual(self.partition_of(stray.id), retention._partition_name(later.date()))
+        # The default partition is attached again and still catches stray rows.
+        Notification.objects.filter(id=self.ids[1]).update(timestamp=later + timedelta(days=62))
+        self.assertEqual(self.partition_of(self.ids[1]), retention.DEFAULT_PARTITION)
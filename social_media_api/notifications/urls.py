@@ -1,7 +1,11 @@
+from django.urls import path
 from .import views
 from rest_framework import routers
 
 routers = routers.DefaultRouter()
 routers.register(r'notifications', views.NotificationViewSet, basename='notifications')
-urlpatterns = routers.urls
+# Listed before the router so 'stream' is not taken for a notification pk.
+urlpatterns = [
+    path('notifications/stream/', views.NotificationStreamView.as_view(), name='notification-stream'),
+] + routers.urls
 
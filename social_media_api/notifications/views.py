@@ -1,11 +1,118 @@
-from rest_framework import viewsets
+import json
+
+from adrf import viewsets as async_viewsets
+from adrf.views import APIView as AsyncAPIView
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.db.models import Count, Max, Q, Sum
+from rest_framework.decorators import action
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from posts.async_views import AsyncListModelMixin
+from posts.pagination import KeysetPagination, KeysetPaginationMixin
+from posts.shaping import QueryShapingMixin
+from . import counters, stream, targets
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import GroupedNotificationSerializer, MarkReadSerializer, NotificationSerializer
+
+
+class NotificationKeysetPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+
 
-class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+class NotificationViewSet(QueryShapingMixin, KeysetPaginationMixin, AsyncListModelMixin,
+                          async_viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    keyset_pagination_class = NotificationKeysetPagination
     
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user).order_by('-timestamp')
\ No newline at end of file
+        # Matches the (recipient, -timestamp, -id) index, so a page reads only its own rows.
+        return Notification.objects.filter(recipient=self.request.user).order_by('-timestamp', '-id')
+
+    @action(detail=False)
+    def grouped(self, request):
+        """Notifications collapsed by verb and target, most recent group first."""
+        groups = (
+            Notification.objects.filter(recipient=request.user)
+            .values('verb', 'target_content_type', 'target_object_id')
+            .annotate(
+                count=Count('id'),
+                actor_count=Sum('actor_count'),
+                unread_count=Count('id', filter=Q(read=False)),
+                latest_timestamp=Max('timestamp'),
+                latest_id=Max('id'),
+            )
+            .order_by('-latest_timestamp')
+        )
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(groups, request, view=self)
+        actors = dict(
+            Notification.objects.filter(id__in=[group['latest_id'] for group in page])
+            .values_list('id', 'actor__username')
+        )
+        summaries = targets.summarize(
+            (group['target_content_type'], group['target_object_id']) for group in page
+        )
+        for group in page:
+            group['latest_actor_username'] = actors.get(group['latest_id'])
+            group['target'] = summaries.get((group['target_content_type'], group['target_object_id']))
+        return paginator.get_paginated_response(GroupedNotificationSerializer(page, many=True).data)
+
+    @action(detail=False, url_path='unread-count')
+    def unread_count(self, request):
+        return Response({'unread_count': counters.get_unread_count(request.user.id)})
+
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        """Mark the given notification IDs, or all of them, as read in one UPDATE."""
+        serializer = MarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        unread = Notification.objects.filter(recipient=request.user, read=False)
+        ids = serializer.validated_data.get('ids')
+        if ids is None:
+            updated = unread.update(read=True)
+            counters.reset_unread(request.user.id)
+        else:
+            updated = unread.filter(id__in=ids).update(read=True)
+            counters.adjust_unread(request.user.id, -updated)
+        return Response({'marked_read': updated})
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients send ``Accept: text/event-stream``; errors are rendered as JSON."""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+
+class NotificationStreamView(AsyncAPIView):
+    """Server-Sent Events stream of new notifications.
+
+    Resumes after the ``Last-Event-ID`` header (or ``?last_event_id=``) when
+    given, otherwise starts with notifications created from now on. Live
+    streaming needs the ASGI server mode; under WSGI the response sends the
+    backlog and closes, and ``EventSource`` reconnects after the retry delay.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [EventStreamRenderer]
+
+    async def get(self, request):
+        last_event_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id')
+        if last_event_id is not None and not last_event_id.isdigit():
+            raise ValidationError({'last_event_id': 'Must be a notification ID.'})
+        last_event_id = last_event_id and int(last_event_id)
+        if isinstance(request._request, ASGIRequest):
+            events = stream.events(request.user.id, last_event_id)
+        else:
+            events = stream.backlog(request.user.id, last_event_id)
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx and similar proxies from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
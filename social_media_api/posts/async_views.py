@@ -0,0 +1,28 @@
+"""Async building blocks for the hot read endpoints.
+
+Views built on ``adrf`` run as coroutines when served over ASGI. Django's ORM
+is synchronous, so each blocking stage (building the queryset, fetching the
+page, serializing it) is handed to a worker thread with ``sync_to_async`` and
+the event loop keeps serving other requests while the database or cache
+answers. Under WSGI the same views still work; Django runs them with
+``async_to_sync``.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework.response import Response
+
+
+class AsyncListModelMixin:
+    """``list()`` as a coroutine for an ``adrf`` generic viewset.
+
+    Unlike adrf's ``alist()`` it goes through the view's own
+    ``filter_queryset()``, so ``QueryShapingMixin`` still applies.
+    """
+
+    async def list(self, request, *args, **kwargs):
+        queryset = await sync_to_async(lambda: self.filter_queryset(self.get_queryset()))()
+        page = await self.apaginate_queryset(queryset)
+        if page is None:
+            data = await sync_to_async(lambda: self.get_serializer(queryset, many=True).data)()
+            return Response(data)
+        data = await sync_to_async(lambda: self.get_serializer(page, many=True).data)()
+        return await self.get_apaginated_response(data)
@@ -0,0 +1,91 @@
+"""Versioned response cache for anonymous post and comment reads.
+
+Every cached response is stored under the current generation of its scope:
+``posts`` for post list pages, ``post:<id>`` for a single post and
+``comments:<post id>`` for the comments of one post. Writes bump the
+generation, which orphans the old entries instead of deleting them one by
+one; they simply expire.
+"""
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _generation_key(scope):
+    return f'posts:gen:{scope}'
+
+
+def get_generation(scope):
+    key = _generation_key(scope)
+    generation = cache.get(key)
+    if generation is None:
+        # Seed from the clock so a lost counter never reuses old generations.
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+
+def bump(*scopes):
+    _bump(scopes)
+    # Bump again once the write is visible, in case a concurrent read cached
+    # the old rows under the new generation in the meantime.
+    transaction.on_commit(partial(_bump, scopes))
+
+
+def _restart(scopes):
+    cache.set_many(dict.fromkeys(map(_generation_key, scopes), time.time_ns()), None)
+
+
+def bump_many(scopes):
+    """``bump()`` for many scopes in one cache round trip, for bulk writes.
+
+    Starts new generations from the clock instead of incrementing each one,
+    which stays ahead of any generation already in use.
+    """
+    scopes = list(scopes)
+    _restart(scopes)
+    transaction.on_commit(partial(_restart, scopes))
+
+
+def invalidate_post(post_id):
+    bump('posts', f'post:{post_id}')
+
+
+def invalidate_posts(post_ids):
+    bump_many(['posts', *[f'post:{post_id}' for post_id in post_ids]])
+
+
+def invalidate_comments(post_id):
+    bump(f'comments:{post_id}')
+
+
+def cache_anonymous(request, scope, view):
+    """Serve ``view()`` from the cache for anonymous requests."""
+    if request.user.is_authenticated:
+        return view()
+
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    key = f'posts:response:{scope}:{get_generation(scope)}:{path}'
+    data = cache.get(key)
+    if data is not None:
+        return Response(data)
+
+    response = view()
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(key, response.data, settings.POSTS_CACHE_TIMEOUT)
+    return response
@@ -0,0 +1,95 @@
+"""Race-free, idempotent likes.
+
+Likes are written with ``INSERT ... ON CONFLICT DO NOTHING RETURNING`` and
+removed with ``DELETE ... RETURNING``, so concurrent double taps never raise
+IntegrityError and each call knows exactly which rows it changed. The counter
+update returns the post authors for notifications, and everything runs in
+one transaction: two statements per call, however many posts it touches.
+Databases without ``ON CONFLICT``/``RETURNING`` support use the ORM instead.
+"""
+from django.db import connection, transaction
+from django.db.models import F
+
+from . import cache
+from .models import Like, Post
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def _supports_upsert():
+    return connection.vendor in ('postgresql', 'sqlite')
+
+
+def _update_counters(post_ids, delta):
+    """Apply ``delta`` to like_count and return ``{post_id: author_id}``."""
+    guard = '' if delta > 0 else f' AND like_count >= {-delta}'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {Post._meta.db_table} SET like_count = like_count + %s '
+            f'WHERE id IN ({_placeholders(post_ids)}){guard} RETURNING id, author_id',
+            [delta, *post_ids],
+        )
+        authors = dict(cursor.fetchall())
+    cache.invalidate_posts(post_ids)
+    return authors
+
+
+@transaction.atomic
+def like(user_id, post_ids):
+    """Like every existing post in ``post_ids``.
+
+    Returns ``{post_id: author_id}`` for the posts that were not liked before.
+    """
+    post_ids = sorted(set(post_ids))
+    if not post_ids:
+        return {}
+    if not _supports_upsert():
+        created = [
+            post.id for post in Post.objects.filter(id__in=post_ids)
+            if Like.objects.get_or_create(user_id=user_id, post=post)[1]
+        ]
+        Post.objects.filter(id__in=created).update(like_count=F('like_count') + 1)
+        if created:
+            cache.invalidate_posts(created)
+        return dict(Post.objects.filter(id__in=created).values_list('id', 'author_id'))
+
+    with connection.cursor() as cursor:
+        # The WHERE clause is required by SQLite to parse INSERT ... SELECT ... ON CONFLICT.
+        cursor.execute(
+            f'INSERT INTO {Like._meta.db_table} (user_id, post_id) '
+            f'SELECT %s, id FROM {Post._meta.db_table} WHERE id IN ({_placeholders(post_ids)}) '
+            f'ON CONFLICT (user_id, post_id) DO NOTHING RETURNING post_id',
+            [user_id, *post_ids],
+        )
+        created = [row[0] for row in cursor.fetchall()]
+    return _update_counters(created, 1) if created else {}
+
+
+@transaction.atomic
+def unlike(user_id, post_ids):
+    """Remove the user's likes on ``post_ids``. Returns the post IDs that were liked."""
+    post_ids = sorted(set(post_ids))
+    if not post_ids:
+        return []
+    if not _supports_upsert():
+        removed = list(
+            Like.objects.filter(user_id=user_id, post_id__in=post_ids).values_list('post_id', flat=True)
+        )
+        Like.objects.filter(user_id=user_id, post_id__in=removed).delete()
+        Post.objects.filter(id__in=removed, like_count__gt=0).update(like_count=F('like_count') - 1)
+        if removed:
+            cache.invalidate_posts(removed)
+        return removed
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {Like._meta.db_table} '
+            f'WHERE user_id = %s AND post_id IN ({_placeholders(post_ids)}) RETURNING post_id',
+            [user_id, *post_ids],
+        )
+        removed = [row[0] for row in cursor.fetchall()]
+    if removed:
+        _update_counters(removed, -1)
+    return removed
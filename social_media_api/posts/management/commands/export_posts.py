@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Stream posts, comments, likes or follow edges to an NDJSON or CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(transfer.COLUMNS), help='What to export.')
+        parser.add_argument('path', help='File to write, .gz to compress; "-" writes to stdout.')
+        parser.add_argument('--format', choices=transfer.FORMATS, default=None,
+                            help='File format (default: from the extension, else ndjson).')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows fetched from the database at a time.')
+        parser.add_argument('--progress', type=float, default=5.0,
+                            help='Seconds between progress lines.')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        file_format = options['format'] or transfer.guess_format(options['path']) or 'ndjson'
+        # Keep progress out of the data when it is written to stdout.
+        out = self.stderr if options['path'] == '-' else self.stdout
+        start = last_report = time.monotonic()
+
+        def rows():
+            nonlocal last_report
+            for count, row in enumerate(transfer.export_rows(kind, options['chunk_size']), start=1):
+                if count % 1000 == 0 and time.monotonic() - last_report >= options['progress']:
+                    last_report = time.monotonic()
+                    out.write(f'Exported {count} {kind} row(s), {count / (last_report - start):.0f}/s...')
+                yield row
+
+        with transfer.open_file(options['path'], 'w') as file:
+            count = transfer.write(file, file_format, kind, rows())
+        out.write(f'Exported {count} {kind} row(s) in {time.monotonic() - start:.1f}s.', self.style.SUCCESS)
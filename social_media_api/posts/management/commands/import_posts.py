@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Stream posts, comments, likes or follow edges from an NDJSON or CSV file into the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(transfer.COLUMNS),
+                            help='What the file holds. Import posts before their comments and likes.')
+        parser.add_argument('path', help='File to read, optionally .gz compressed; "-" reads stdin.')
+        parser.add_argument('--format', choices=transfer.FORMATS, default=None,
+                            help='File format (default: from the extension, else ndjson).')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows written per transaction.')
+        parser.add_argument('--progress', type=float, default=5.0,
+                            help='Seconds between progress lines.')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        file_format = options['format'] or transfer.guess_format(options['path']) or 'ndjson'
+        start = last_report = time.monotonic()
+        read = imported = 0
+        try:
+            with transfer.open_file(options['path'], 'r') as file:
+                rows = transfer.read(file, file_format)
+                for read, imported in transfer.import_rows(kind, rows, options['batch_size']):
+                    if time.monotonic() - last_report >= options['progress']:
+                        last_report = time.monotonic()
+                        rate = read / (last_report - start)
+                        self.stdout.write(f'Read {read} {kind} row(s), {rate:.0f}/s...')
+        except OSError as exc:
+            raise CommandError(exc)
+        except (KeyError, ValueError) as exc:
+            raise CommandError(f'Malformed {kind} row after row {read}: {exc!r}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} of {read} {kind} row(s) in {time.monotonic() - start:.1f}s; '
+            f'{read - imported} referred to unknown users or posts.'
+        ))
+        if kind in ('posts', 'follows'):
+            self.stdout.write('Run `manage.py rebuild_timelines` to add the new posts and follows to home timelines.')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Recreate the full-text search index and triggers for posts and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database alias to rebuild (default: "default").')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        search.install(connection)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the search index on {connection.vendor}.'))
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized home timelines from the follow graph.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild the timeline of this user ID (repeatable).')
+
+    def handle(self, *args, **options):
+        # Recompute the fan-out-on-read author set before pushing any posts.
+        cache.delete(timeline.CELEBRITIES_CACHE_KEY)
+        timeline.get_celebrity_ids()
+
+        users = get_user_model().objects.order_by('id')
+        if options['user_ids']:
+            users = users.filter(id__in=options['user_ids'])
+
+        count = 0
+        for user in users.iterator(chunk_size=500):
+            timeline.rebuild(user)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} timeline(s).'))
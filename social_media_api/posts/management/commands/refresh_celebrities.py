@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = ('Recompute the authors whose posts are merged into feeds at read time, and fan out '
+            'the recent posts of those who dropped below FEED_FANOUT_MAX_FOLLOWERS.')
+
+    def handle(self, *args, **options):
+        added, removed = timeline.refresh_celebrities()
+        self.stdout.write(self.style.SUCCESS(
+            f'Added {len(added)} and removed {len(removed)} read-time merged author(s).'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Cut every home timeline back to its newest FEED_TIMELINE_LENGTH entries.'
+
+    def handle(self, *args, **options):
+        users = entries = 0
+        for user_id in timeline.overgrown_user_ids().iterator():
+            entries += timeline.trim(user_id)
+            users += 1
+        self.stdout.write(self.style.SUCCESS(f'Removed {entries} entry(ies) from {users} timeline(s).'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:05
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from posts import search
+
+
+def install_search(apps, schema_editor):
+    search.install(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(install_search, uninstall_search),
+    ]
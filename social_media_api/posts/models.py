@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 
 class Post(models.Model):
     title = models.CharField(max_length=200)
@@ -7,6 +8,19 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Denormalized engagement counters, kept in sync with F() updates.
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    # Maintained by a database trigger on PostgreSQL (see posts/search.py).
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Post list and keyset pages: ORDER BY created_at DESC, id DESC.
+            models.Index(fields=['-created_at', '-id'], name='posts_post_created_id'),
+            # ?author= filter, timeline backfill and read-time fan-in.
+            models.Index(fields=['author', '-created_at', '-id'], name='posts_post_author_created'),
+        ]
     
     def __str__(self):
         return self.title
@@ -17,6 +31,13 @@ class Comment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='comments')
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # ?post= filter in chronological order.
+            models.Index(fields=['post', 'created_at', 'id'], name='posts_comment_post_created'),
+        ]
 
     def __str__(self):
         try:
@@ -33,3 +54,19 @@ class Like(models.Model):
 
     def __str__(self):
         return f"{self.user.username} likes {self.post.title}"
+
+class TimelineEntry(models.Model):
+    """A post pushed into a follower's materialized home timeline."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    # Copied from the post so a page is one slice of the (user, -created_at, -post) index.
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='posts_timeline_user_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} in timeline of {self.user_id}"
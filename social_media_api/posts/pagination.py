@@ -0,0 +1,134 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+from . import timeline
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination keyed on ``(created_at, id)``, newest first.
+
+    Each page is a range filter on the last row seen instead of an OFFSET, and
+    no COUNT(*) is issued, so deep pages cost the same as the first one.
+    Cursors are opaque base64 tokens built by ``CursorPagination``.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None and self.cursor.position is not None:
+            queryset = queryset.filter(self._seek(self.cursor.position, reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._position(self.page[0])))
+
+    def _position(self, instance):
+        key_field, id_field = (field.lstrip('-') for field in self.ordering)
+        return f'{getattr(instance, key_field).isoformat()}|{getattr(instance, id_field)}'
+
+    def _parse(self, position):
+        try:
+            key, pk = position.rsplit('|', 1)
+            key, pk = parse_datetime(key), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if key is None:
+            raise NotFound(self.invalid_cursor_message)
+        return key, pk
+
+    def _seek(self, position, reverse):
+        key_field, id_field = (field.lstrip('-') for field in self.ordering)
+        key, pk = self._parse(position)
+        descending = self.ordering[0].startswith('-') != reverse
+        op = 'lt' if descending else 'gt'
+        return Q(**{f'{key_field}__{op}': key}) | Q(**{key_field: key, f'{id_field}__{op}': pk})
+
+
+class CommentKeysetPagination(KeysetPagination):
+    """Keyset pagination of comments, oldest first like their default ordering."""
+    ordering = ('created_at', 'id')
+
+
+class FeedPagination(KeysetPagination):
+    """Keyset pagination of the requesting user's home feed.
+
+    The page is chosen from the materialized timeline by
+    ``timeline.get_feed_keys()``; the view's queryset only loads the posts of
+    that page by primary key.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        position = None
+        if self.cursor is not None and self.cursor.position is not None:
+            position = self._parse(self.cursor.position)
+        keys = timeline.get_feed_keys(request.user, self.page_size + 1, position, reverse)
+        has_more = len(keys) > self.page_size
+        post_ids = [post_id for _, post_id in keys[:self.page_size]]
+        posts = queryset.in_bulk(post_ids)
+        self.page = [posts[post_id] for post_id in post_ids if post_id in posts]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+
+class KeysetPaginationMixin:
+    """Use keyset pagination when the client passes ``cursor`` or ``pagination=cursor``.
+
+    Page-number pagination stays the default so existing clients keep their
+    ``count`` and ``page`` parameters.
+    """
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if 'cursor' in params or params.get('pagination') == 'cursor':
+                self._paginator = self.keyset_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
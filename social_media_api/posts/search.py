@@ -0,0 +1,162 @@
+"""Full-text search for posts and comments.
+
+PostgreSQL keeps a weighted ``search_vector`` column up to date with a
+trigger and indexes it with GIN. SQLite (local runs and tests) mirrors the
+searchable columns into an FTS5 shadow table kept in sync by triggers. Both
+answer a query from an inverted index instead of scanning every row with
+``ILIKE '%term%'``, and rank the matches. Other databases fall back to DRF's
+``SearchFilter``.
+"""
+from django.db import connections
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+SEARCH_CONFIG = 'english'
+
+# table -> [(column, weight)], weights as in PostgreSQL's setweight().
+SEARCHABLE = {
+    'posts_post': [('title', 'A'), ('content', 'B')],
+    'posts_comment': [('content', 'A')],
+}
+# bm25() column weights matching the PostgreSQL labels.
+SQLITE_WEIGHTS = {'A': 10.0, 'B': 1.0}
+
+
+def _postgres_sql(table, columns):
+    vector = ' || '.join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.{column}, '')), '{weight}')"
+        for column, weight in columns
+    )
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {vector};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        f'DROP TRIGGER IF EXISTS {table}_search_vector ON {table}',
+        f"""
+        CREATE TRIGGER {table}_search_vector
+        BEFORE INSERT OR UPDATE OF {', '.join(column for column, _ in columns)} ON {table}
+        FOR EACH ROW EXECUTE FUNCTION {table}_search_vector_update()
+        """,
+        f'CREATE INDEX IF NOT EXISTS {table}_search_gin ON {table} USING gin (search_vector)',
+        # Fire the trigger for existing rows.
+        f'UPDATE {table} SET {columns[0][0]} = {columns[0][0]}',
+    ]
+
+
+def _sqlite_sql(table, columns):
+    names = ', '.join(column for column, _ in columns)
+    new_values = ', '.join(f'new.{column}' for column, _ in columns)
+    old_values = ', '.join(f'old.{column}' for column, _ in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5({names}, content='{table}', content_rowid='id')",
+        f'DROP TRIGGER IF EXISTS {table}_fts_insert',
+        f'DROP TRIGGER IF EXISTS {table}_fts_delete',
+        f'DROP TRIGGER IF EXISTS {table}_fts_update',
+        f"""
+        CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {table}_fts(rowid, {names}) VALUES (new.id, {new_values});
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {table}_fts({table}_fts, rowid, {names}) VALUES ('delete', old.id, {old_values});
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_fts_update AFTER UPDATE OF {names} ON {table} BEGIN
+            INSERT INTO {table}_fts({table}_fts, rowid, {names}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {table}_fts(rowid, {names}) VALUES (new.id, {new_values});
+        END
+        """,
+        f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')",
+    ]
+
+
+def _postgres_drop_sql(table):
+    return [
+        f'DROP INDEX IF EXISTS {table}_search_gin',
+        f'DROP TRIGGER IF EXISTS {table}_search_vector ON {table}',
+        f'DROP FUNCTION IF EXISTS {table}_search_vector_update()',
+    ]
+
+
+def _sqlite_drop_sql(table):
+    return [
+        f'DROP TRIGGER IF EXISTS {table}_fts_insert',
+        f'DROP TRIGGER IF EXISTS {table}_fts_delete',
+        f'DROP TRIGGER IF EXISTS {table}_fts_update',
+        f'DROP TABLE IF EXISTS {table}_fts',
+    ]
+
+
+def _execute(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install(connection):
+    """Create (or refresh) the search index, triggers and contents. Idempotent."""
+    for table, columns in SEARCHABLE.items():
+        if connection.vendor == 'postgresql':
+            _execute(connection, _postgres_sql(table, columns))
+        elif connection.vendor == 'sqlite':
+            _execute(connection, _sqlite_sql(table, columns))
+
+
+def uninstall(connection):
+    for table in SEARCHABLE:
+        if connection.vendor == 'postgresql':
+            _execute(connection, _postgres_drop_sql(table))
+        elif connection.vendor == 'sqlite':
+            _execute(connection, _sqlite_drop_sql(table))
+
+
+class FullTextSearchFilter(SearchFilter):
+    """``SearchFilter`` answered by the database's full-text index.
+
+    Matches are ranked by relevance unless the client asked for an explicit
+    ``ordering``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        table = queryset.model._meta.db_table
+        vendor = connections[queryset.db].vendor
+        if not terms or table not in SEARCHABLE or vendor not in ('postgresql', 'sqlite'):
+            return super().filter_queryset(request, queryset, view)
+
+        if vendor == 'postgresql':
+            # Quoted lexemes are still stemmed; :* prefix-matches them, like
+            # the SQLite branch below.
+            raw = ' & '.join("'%s':*" % term.replace('\\', '\\\\').replace("'", "''") for term in terms)
+            query = SearchQuery(raw, config=SEARCH_CONFIG, search_type='raw')
+            queryset = queryset.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F('search_vector'), query),
+            )
+        else:
+            # Quote every term and prefix-match it, which is closest to the
+            # substring matching clients were used to.
+            match = ' '.join('"%s"*' % term.replace('"', '""') for term in terms)
+            fts = f'{table}_fts'
+            weights = ', '.join(str(SQLITE_WEIGHTS[weight]) for _, weight in SEARCHABLE[table])
+            queryset = queryset.filter(
+                id__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', (match,)),
+            ).annotate(
+                search_rank=RawSQL(
+                    f'SELECT -bm25({fts}, {weights}) FROM {fts} WHERE {fts} MATCH %s AND {fts}.rowid = {table}.id',
+                    (match,),
+                ),
+            )
+
+        if api_settings.ORDERING_PARAM not in request.query_params:
+            queryset = queryset.order_by('-search_rank', '-id')
+        return queryset
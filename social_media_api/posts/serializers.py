@@ -6,8 +6,9 @@ class PostSerializer(serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
     class Meta:
         model = Post
-        fields = ['id', 'title', 'content', 'created_at', 'updated_at', 'author']
-        read_only_fields = ['author']
+        fields = ['id', 'title', 'content', 'created_at', 'updated_at', 'author', 'like_count', 'comment_count']
+        read_only_fields = ['author', 'like_count', 'comment_count']
+        select_related = ['author']
 
 class CommentSerializer(serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
@@ -15,6 +16,7 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ['id', 'content', 'created_at', 'updated_at', 'author', 'post']
         read_only_fields = ['author']
+        select_related = ['author']
 
 class LikeSerializer(serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username')
@@ -22,3 +24,8 @@ class LikeSerializer(serializers.ModelSerializer):
         model = Like
         fields = ['id', 'user', 'post']
         read_only_fields = ['user']
+        select_related = ['user']
+
+class BatchLikeSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['like', 'unlike'])
+    post_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=100)
@@ -0,0 +1,80 @@
+"""Query shaping for serializer-backed viewsets.
+
+Serializers declare the relations they render on their ``Meta``::
+
+    class Meta:
+        model = Post
+        fields = [...]
+        select_related = ['author']
+        prefetch_related = []
+
+``QueryShapingMixin`` applies those to the viewset queryset and, for read
+requests, restricts the SELECT list with ``only()`` to the columns the
+serializer actually reads. Fields with ``source='*'`` turn ``only()`` off
+unless they list the columns they read in an ``only_fields`` attribute.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+
+
+@lru_cache(maxsize=None)
+def _only_fields(serializer_class):
+    """Return the ``only()`` paths a serializer needs, or None if unknown."""
+    meta = serializer_class.Meta
+    model = meta.model
+    select_related = set(getattr(meta, 'select_related', ()))
+    paths = set()
+
+    for field in serializer_class().fields.values():
+        if getattr(field, 'only_fields', None) is not None:
+            paths.update(field.only_fields)
+            continue
+        if field.source == '*':
+            return None
+        current = model
+        prefix = []
+        for attr in field.source.split('.'):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # Properties and methods may read any column.
+                return None
+            if model_field.many_to_many or model_field.one_to_many:
+                break
+            prefix.append(attr)
+            path = '__'.join(prefix)
+            paths.add(path)
+            if model_field.is_relation and path in select_related:
+                current = model_field.related_model
+            else:
+                break
+    return sorted(paths)
+
+
+def shape_queryset(queryset, serializer_class, only=True):
+    meta = serializer_class.Meta
+    select_related = getattr(meta, 'select_related', ())
+    prefetch_related = getattr(meta, 'prefetch_related', ())
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    if only:
+        fields = _only_fields(serializer_class)
+        if fields:
+            queryset = queryset.only(*fields)
+    return queryset
+
+
+class QueryShapingMixin:
+    """Apply the serializer's declared relation needs to every queryset."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return shape_queryset(
+            queryset,
+            self.get_serializer_class(),
+            only=self.request.method in SAFE_METHODS,
+        )
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache
+from .models import Comment, Post
+
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post_cache(sender, instance, **kwargs):
+    cache.invalidate_post(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment_cache(sender, instance, **kwargs):
+    cache.invalidate_comments(instance.post_id)
@@ -0,0 +1,28 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountAssertionsMixin:
+    """Assertions for catching N+1 queries in list endpoints."""
+
+    def assertQueriesIndependentOfPageSize(self, url, page_sizes=(1, 10), params=None):
+        """Fail if fetching a bigger page of ``url`` issues more queries.
+
+        The caller must create at least ``max(page_sizes)`` rows first.
+        """
+        captured = {}
+        for page_size in page_sizes:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {**(params or {}), 'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), page_size,
+                             f'{url} returned fewer than {page_size} rows; create more fixtures')
+            captured[page_size] = [query['sql'] for query in queries.captured_queries]
+
+        counts = {page_size: len(sqls) for page_size, sqls in captured.items()}
+        if len(set(counts.values())) > 1:
+            largest = max(page_sizes)
+            self.fail(
+                f'Query count for {url} grows with page size {counts}. '
+                f'Queries at page_size={largest}:\n' + '\n'.join(captured[largest])
+            )
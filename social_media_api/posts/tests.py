@@ -1,10 +1,32 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
-from django.urls import reverse
-from rest_framework.test import APITestCase
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework import status
-from .models import Post, Comment
+from rest_framework.authtoken.models import Token
+from accounts import graph
+from benchmarks.explain_indexes import check_plans, seed
+from notifications.models import PendingNotification
+from social_media_api import db_routing
+from . import timeline
+from .models import Post, Comment, Like, TimelineEntry
+from .testing import QueryCountAssertionsMixin
 
 User = get_user_model()
 
@@ -163,4 +185,566 @@ class CommentAPITest(APITestCase):
         url = reverse('comment-list')
         response = self.client.get(url, {'search': 'Test'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data['results']), 1)
\ No newline at end of file
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class FeedTimelineTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.old_post = Post.objects.create(title='Old Post', content='Before follow', author=self.author)
+
+    def follow(self):
+        self.client.force_authenticate(user=self.reader)
+        self.client.post(reverse('follow_user', kwargs={'user_id': self.author.pk}))
+
+    def create_post_as_author(self, title):
+        self.client.force_authenticate(user=self.author)
+        response = self.client.post(reverse('post-list'), {'title': title, 'content': 'Content'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def get_feed_ids(self):
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get(reverse('feed-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data['results']]
+
+    def test_follow_backfills_timeline(self):
+        self.follow()
+        self.assertEqual(self.get_feed_ids(), [self.old_post.pk])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        self.follow()
+        post_id = self.create_post_as_author('New Post')
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post_id=post_id).exists())
+        self.assertEqual(self.get_feed_ids(), [post_id, self.old_post.pk])
+
+    def test_unfollow_removes_author_posts(self):
+        self.follow()
+        self.client.post(reverse('unfollow_user', kwargs={'user_id': self.author.pk}))
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader).count(), 0)
+        self.assertEqual(self.get_feed_ids(), [])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_celebrity_posts_are_merged_on_read(self):
+        self.follow()
+        call_command('refresh_celebrities', stdout=StringIO())
+        post_id = self.create_post_as_author('Celebrity Post')
+        self.assertFalse(TimelineEntry.objects.filter(post_id=post_id).exists())
+        self.assertEqual(self.get_feed_ids(), [post_id, self.old_post.pk])
+
+    def test_former_celebrity_posts_stay_in_feed(self):
+        self.follow()
+        with override_settings(FEED_FANOUT_MAX_FOLLOWERS=0):
+            call_command('refresh_celebrities', stdout=StringIO())
+        celebrity_post_id = self.create_post_as_author('Celebrity Post')
+        self.assertFalse(TimelineEntry.objects.filter(post_id=celebrity_post_id).exists())
+
+        # Requests never change the set; the refresh fans out the old posts.
+        call_command('refresh_celebrities', stdout=StringIO())
+        self.assertNotIn(self.author.pk, timeline.get_celebrity_ids())
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post_id=celebrity_post_id).exists())
+        post_id = self.create_post_as_author('Regular Post')
+        self.assertEqual(self.get_feed_ids(), [post_id, celebrity_post_id, self.old_post.pk])
+
+    @override_settings(FEED_TIMELINE_LENGTH=3)
+    def test_trim_keeps_newest_entries(self):
+        self.follow()
+        post_ids = [self.create_post_as_author(f'Post {i}') for i in range(4)]
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader).count(), 5)
+        call_command('trim_timelines', stdout=StringIO())
+        self.assertCountEqual(
+            TimelineEntry.objects.filter(user=self.reader).values_list('post_id', flat=True),
+            post_ids[1:],
+        )
+        self.assertEqual(self.get_feed_ids(), post_ids[:0:-1])
+
+    def test_feed_pages_merge_timeline_and_celebrity_posts(self):
+        self.follow()
+        celebrity = User.objects.create_user(username='celebrity', password='testpass123')
+        self.reader.following.add(celebrity)
+        for i in range(6):
+            self.create_post_as_author(f'Post {i}')
+            Post.objects.create(title=f'Celebrity {i}', content='Content', author=celebrity)
+        # Fanned out before the author became a celebrity: in the timeline too.
+        timeline.fan_out_post(Post.objects.create(title='Both', content='Content', author=celebrity))
+        cache.set(timeline.CELEBRITIES_CACHE_KEY, {celebrity.pk}, None)
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        self.client.force_authenticate(user=self.reader)
+        url = reverse('feed-list') + '?page_size=4'
+        seen = []
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn('count', response.data)
+                seen.extend(post['id'] for post in response.data['results'])
+                last = response
+                url = response.data['next']
+        self.assertEqual(seen, expected)
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in queries.captured_queries))
+
+        back = self.client.get(last.data['previous'])
+        self.assertEqual([post['id'] for post in back.data['results']], expected[8:12])
+
+
+class KeysetPaginationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author', password='testpass123')
+        Post.objects.bulk_create(
+            Post(title=f'Post {i}', content='Content', author=self.user) for i in range(25)
+        )
+        # Identical timestamps force the id tie-breaker to be used.
+        Post.objects.filter(id__in=Post.objects.order_by('id').values('id')[:5]).update(
+            created_at=Post.objects.order_by('id').first().created_at
+        )
+        self.expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def test_walks_every_page_without_count(self):
+        url = reverse('post-list') + '?pagination=cursor&page_size=10'
+        seen = []
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn('count', response.data)
+                seen.extend(post['id'] for post in response.data['results'])
+                url = response.data['next']
+        self.assertEqual(seen, self.expected)
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in queries.captured_queries))
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get(reverse('post-list'), {'pagination': 'cursor'})
+        second = self.client.get(first.data['next'])
+        self.assertIsNone(first.data['previous'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [post['id'] for post in back.data['results']],
+            [post['id'] for post in first.data['results']],
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('post-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_comments_keep_their_order_in_both_modes(self):
+        post = Post.objects.order_by('id').first()
+        Comment.objects.bulk_create(
+            Comment(content=f'Comment {i}', author=self.user, post=post) for i in range(15)
+        )
+        params = {'post': post.pk, 'page_size': 100}
+        pages = self.client.get(reverse('comment-list'), params)
+        cursor = self.client.get(reverse('comment-list'), {**params, 'pagination': 'cursor'})
+        expected = list(Comment.objects.order_by('created_at', 'id').values_list('id', flat=True))
+        self.assertEqual([comment['id'] for comment in pages.data['results']], expected)
+        self.assertEqual([comment['id'] for comment in cursor.data['results']], expected)
+
+
+
+class EngagementCounterTest(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        self.post = Post.objects.create(title='Test Post', content='Test content', author=self.author)
+        self.client.force_authenticate(user=self.reader)
+
+    def test_like_and_unlike_update_like_count(self):
+        self.client.post(reverse('like-post', kwargs={'pk': self.post.pk}))
+        self.client.post(reverse('like-post', kwargs={'pk': self.post.pk}))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+        self.client.post(reverse('unlike-post', kwargs={'pk': self.post.pk}))
+        self.client.post(reverse('unlike-post', kwargs={'pk': self.post.pk}))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_comment_create_and_delete_update_comment_count(self):
+        response = self.client.post(reverse('comment-list'), {'content': 'Nice', 'post': self.post.pk})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+        self.client.delete(reverse('comment-detail', kwargs={'pk': response.data['id']}))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_counts_are_serialized(self):
+        self.client.post(reverse('like-post', kwargs={'pk': self.post.pk}))
+        response = self.client.get(reverse('post-detail', kwargs={'pk': self.post.pk}))
+        self.assertEqual(response.data['like_count'], 1)
+        self.assertEqual(response.data['comment_count'], 0)
+
+
+
+class QueryShapingTest(QueryCountAssertionsMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        authors = [User.objects.create_user(username=f'author{i}', password='testpass123') for i in range(10)]
+        self.post = Post.objects.create(title='Commented', content='Content', author=authors[0])
+        for author in authors:
+            Post.objects.create(title=f'Post by {author.username}', content='Content', author=author)
+            Comment.objects.create(content='Comment', author=author, post=self.post)
+            self.client.force_authenticate(user=self.reader)
+            self.client.post(reverse('follow_user', kwargs={'user_id': author.pk}))
+        self.client.force_authenticate(user=None)
+
+    def test_post_list(self):
+        self.assertQueriesIndependentOfPageSize(reverse('post-list'))
+
+    def test_comment_list(self):
+        self.assertQueriesIndependentOfPageSize(reverse('comment-list'), params={'post': self.post.pk})
+
+    def test_feed(self):
+        self.client.force_authenticate(user=self.reader)
+        self.assertQueriesIndependentOfPageSize(reverse('feed-list'))
+
+
+
+class ResponseCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author', password='testpass123')
+        self.post = Post.objects.create(title='Original', content='Content', author=self.user)
+
+    def test_anonymous_list_is_cached_until_a_write(self):
+        url = reverse('post-list')
+        self.assertEqual(self.client.get(url).data['results'][0]['title'], 'Original')
+        # A queryset update bypasses the invalidation hooks, so the cached page is served.
+        Post.objects.filter(pk=self.post.pk).update(title='Changed')
+        self.assertEqual(self.client.get(url).data['results'][0]['title'], 'Original')
+
+        self.client.force_authenticate(user=self.user)
+        self.client.post(url, {'title': 'Another', 'content': 'Content'})
+        self.client.force_authenticate(user=None)
+        titles = [post['title'] for post in self.client.get(url).data['results']]
+        self.assertIn('Changed', titles)
+
+    def test_retrieve_is_invalidated_on_like(self):
+        url = reverse('post-detail', kwargs={'pk': self.post.pk})
+        self.assertEqual(self.client.get(url).data['like_count'], 0)
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse('like-post', kwargs={'pk': self.post.pk}))
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(url).data['like_count'], 1)
+
+    def test_comments_by_post_are_invalidated_on_comment(self):
+        url = reverse('comment-list')
+        self.assertEqual(len(self.client.get(url, {'post': self.post.pk}).data['results']), 0)
+        self.client.force_authenticate(user=self.user)
+        self.client.post(url, {'content': 'First', 'post': self.post.pk})
+        self.client.force_authenticate(user=None)
+        self.assertEqual(len(self.client.get(url, {'post': self.post.pk}).data['results']), 1)
+
+
+
+class IndexUsageTest(TestCase):
+    def setUp(self):
+        seed()
+
+    def test_hot_queries_use_composite_indexes(self):
+        for label, index, plan, used in check_plans():
+            with self.subTest(label):
+                self.assertTrue(used, f'{label} does not use {index}:\n{plan}')
+
+
+
+class FullTextSearchTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author', password='testpass123')
+        self.tutorial = Post.objects.create(title='Django tutorial', content='Models and views', author=self.user)
+        self.mention = Post.objects.create(title='Weekend', content='Read a django book', author=self.user)
+        Post.objects.create(title='Unrelated', content='Nothing here', author=self.user)
+
+    def search(self, term, **params):
+        response = self.client.get(reverse('post-list'), {'search': term, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data['results']]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search('django'), [self.tutorial.pk, self.mention.pk])
+
+    def test_prefix_match(self):
+        self.assertEqual(self.search('tutor'), [self.tutorial.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.patch(reverse('post-detail', kwargs={'pk': self.tutorial.pk}), {'title': 'Flask tutorial'})
+        self.client.delete(reverse('post-detail', kwargs={'pk': self.mention.pk}))
+        self.assertEqual(self.search('django'), [])
+        self.assertEqual(self.search('flask'), [self.tutorial.pk])
+
+    def test_explicit_ordering_wins_over_rank(self):
+        self.assertEqual(self.search('django', ordering='-created_at'), [self.mention.pk, self.tutorial.pk])
+
+    def test_quotes_in_terms_are_escaped(self):
+        self.assertEqual(self.search('"django'), [self.tutorial.pk, self.mention.pk])
+
+
+
+class LikeUpsertTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        self.posts = [Post.objects.create(title=f'Post {i}', content='Content', author=self.author) for i in range(3)]
+        self.client.force_authenticate(user=self.reader)
+
+    def test_like_is_idempotent(self):
+        url = reverse('like-post', kwargs={'pk': self.posts[0].pk})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+        writes = [q for q in queries.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(len(writes), 3)  # like, counter, notification outbox
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].like_count, 1)
+        self.assertEqual(Like.objects.count(), 1)
+
+    def test_like_missing_post(self):
+        response = self.client.post(reverse('like-post', kwargs={'pk': 999999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(reverse('unlike-post', kwargs={'pk': 999999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_batch_like_and_unlike(self):
+        ids = [post.pk for post in self.posts]
+        self.client.post(reverse('like-post', kwargs={'pk': ids[0]}))
+        response = self.client.post(reverse('batch-like'), {'action': 'like', 'post_ids': ids + [999999]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['liked'], ids[1:])
+        self.assertEqual(PendingNotification.objects.count(), 3)
+        self.assertEqual(list(Post.objects.order_by('id').values_list('like_count', flat=True)), [1, 1, 1])
+
+        response = self.client.post(reverse('batch-like'), {'action': 'unlike', 'post_ids': ids[:2]}, format='json')
+        self.assertEqual(response.data['unliked'], ids[:2])
+        self.assertEqual(list(Post.objects.order_by('id').values_list('like_count', flat=True)), [0, 0, 1])
+
+    def test_batch_like_bumps_cache_generations_once(self):
+        ids = [post.pk for post in self.posts]
+        with mock.patch('posts.cache.cache.set_many') as set_many, \
+                mock.patch('posts.cache.cache.incr') as incr, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('batch-like'), {'action': 'like', 'post_ids': ids}, format='json')
+        incr.assert_not_called()
+        self.assertEqual(set_many.call_count, 2)  # now and after commit
+        self.assertEqual(
+            set(set_many.call_args.args[0]),
+            {f'posts:gen:{scope}' for scope in ['posts', *[f'post:{pk}' for pk in ids]]},
+        )
+
+    def test_batch_like_validates_input(self):
+        response = self.client.post(reverse('batch-like'), {'action': 'love', 'post_ids': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='testpass123')
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.user.following.add(self.author)
+        self.post = Post.objects.create(title='Async', content='Content', author=self.author)
+        TimelineEntry.objects.create(user=self.user, post=self.post, created_at=self.post.created_at)
+        self.headers = {'Authorization': 'Token ' + Token.objects.create(user=self.user).key}
+
+    def test_hot_endpoints_are_coroutines(self):
+        for url in (
+            reverse('feed-list'),
+            reverse('notifications-list'),
+            reverse('like-post', kwargs={'pk': self.post.pk}),
+            reverse('profile'),
+        ):
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(url).func), url)
+
+    async def test_feed_and_like_over_async_client(self):
+        response = await self.async_client.get(reverse('feed-list'), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['id'] for post in response.json()['results']], [self.post.pk])
+
+        response = await self.async_client.post(reverse('like-post', kwargs={'pk': self.post.pk}), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(await Like.objects.filter(post=self.post).acount(), 1)
+
+        response = await self.async_client.get(reverse('profile'), headers=self.headers)
+        self.assertEqual(response.json()['following_count'], 1)
+
+
+HAS_REPLICA = 'replica_1' in settings.DATABASES
+
+
+@skipUnless(HAS_REPLICA, 'Needs the replica_1 alias from social_media_api.test_settings.')
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTest(APITransactionTestCase):
+    # replica_1 mirrors the test database over its own connection, so the
+    # rows must be committed for it to see them. The test runner sets up every
+    # alias listed here, even for skipped tests.
+    databases = {'default', 'replica_1'} if HAS_REPLICA else {'default'}
+
+    def setUp(self):
+        cache.clear()
+        db_routing.reset()
+        self.addCleanup(db_routing.reset)
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+        self.post = Post.objects.create(title='Existing', content='Content', author=self.user)
+
+    def request(self, method, **data):
+        """Send ``method`` to the post list; returns the response and the tables each alias queried."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica_1']) as replica:
+            response = getattr(self.client, method)(reverse('post-list'), data)
+        touched = {
+            alias: ' '.join(query['sql'] for query in queries.captured_queries)
+            for alias, queries in (('default', primary), ('replica_1', replica))
+        }
+        return response, touched
+
+    def read_alias(self, method='GET'):
+        aliases = []
+
+        def view(request):
+            aliases.append(Post.objects.all().db)
+            return HttpResponse()
+
+        db_routing.ReplicaRoutingMiddleware(view)(RequestFactory().generic(method, '/'))
+        return aliases[0]
+
+    def test_safe_requests_read_from_the_replica(self):
+        self.assertEqual(self.read_alias('GET'), 'replica_1')
+        self.assertEqual(self.read_alias('POST'), 'default')
+
+        response, touched = self.request('get')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['title'] for post in response.data['results']], ['Existing'])
+        self.assertIn('"posts_post"', touched['replica_1'])
+        self.assertNotIn('"posts_post"', touched['default'])
+
+    def test_user_is_pinned_to_primary_after_writing(self):
+        response, touched = self.request('post', title='New', content='Content')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('INSERT INTO "posts_post"', touched['default'])
+        self.assertNotIn('"posts_post"', touched['replica_1'])
+
+        response, touched = self.request('get')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn('"posts_post"', touched['default'])
+        self.assertNotIn('"posts_post"', touched['replica_1'])
+
+        cache.delete(db_routing._pin_key(self.user.pk))
+        response, touched = self.request('get')
+        self.assertIn('"posts_post"', touched['replica_1'])
+
+    def test_raw_sql_writes_pin_the_user(self):
+        # Likes are written with raw SQL, which the router never sees.
+        Like.objects.create(user=self.user, post=self.post)
+        response = self.client.post(reverse('unlike-post', kwargs={'pk': self.post.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(cache.get(db_routing._pin_key(self.user.pk)))
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(Post.objects.all().db, 'default')
+        self.assertEqual(router.db_for_write(Post), 'default')
+
+    def test_falls_back_to_primary_without_healthy_replicas(self):
+        # An unreachable replica cannot be set up here; fail its probe instead.
+        with mock.patch.object(db_routing, '_check', return_value=False) as check:
+            self.assertEqual(self.read_alias(), 'default')
+            self.assertEqual(self.read_alias(), 'default')
+        # Probe results are reused until DB_REPLICA_CHECK_INTERVAL passes.
+        self.assertEqual(check.call_count, 1)
+
+    def test_lagging_replica_is_unhealthy(self):
+        self.assertTrue(db_routing._check('replica_1'))
+        with override_settings(DB_REPLICA_MAX_LAG=-1), \
+                self.assertLogs('social_media_api.db_routing', 'WARNING') as logs:
+            self.assertFalse(db_routing._check('replica_1'))
+        self.assertIn('Replica replica_1 is 0.0 seconds behind', logs.output[0])
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(router.allow_migrate('replica_1', 'posts', model_name='post'))
+        self.assertTrue(router.allow_migrate('default', 'posts', model_name='post'))
+
+
+class PostTransferTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', password='testpass123')
+        self.post = Post.objects.create(title='Hello, "world"', content='Line one\nLine two', author=self.alice)
+        self.other = Post.objects.create(title='Second', content='Content', author=self.bob)
+        Post.objects.filter(pk=self.post.pk).update(created_at=timezone.now() - timedelta(days=30))
+        Comment.objects.create(content='Nice', author=self.bob, post=self.post)
+        Like.objects.create(user=self.bob, post=self.post)
+        Like.objects.create(user=self.alice, post=self.post)
+        self.bob.following.add(self.alice)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def transfer(self, command, kind, name):
+        out = StringIO()
+        call_command(command, kind, self.path(name), stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_round_trip(self):
+        created_at = Post.objects.get(pk=self.post.pk).created_at
+        for extension in ('ndjson', 'csv.gz'):
+            with self.subTest(extension):
+                for kind in ('posts', 'comments', 'likes', 'follows'):
+                    self.transfer('export_posts', kind, f'{kind}.{extension}')
+                Post.objects.all().delete()
+                self.bob.following.clear()
+
+                for kind in ('posts', 'comments', 'likes', 'follows'):
+                    self.transfer('import_posts', kind, f'{kind}.{extension}')
+
+                post = Post.objects.get(pk=self.post.pk)
+                self.assertEqual((post.title, post.content), ('Hello, "world"', 'Line one\nLine two'))
+                self.assertEqual(post.created_at, created_at)
+                self.assertEqual((post.like_count, post.comment_count), (2, 1))
+                self.assertEqual(Post.objects.count(), 2)
+                self.assertEqual(graph.following_ids(self.bob.pk), {self.alice.pk})
+                # New posts get IDs after the imported ones.
+                new = Post.objects.create(title='New', content='-', author=self.bob)
+                self.assertGreater(new.pk, self.other.pk)
+                new.delete()
+
+    def test_unknown_references_are_skipped_and_reruns_are_idempotent(self):
+        rows = [
+            {'user': 'alice', 'post': self.other.pk},
+            {'user': 'nobody', 'post': self.other.pk},
+            {'user': 'alice', 'post': 999999},
+        ]
+        with open(self.path('likes.ndjson'), 'w') as file:
+            file.writelines(json.dumps(row) + '\n' for row in rows)
+
+        self.assertIn('Imported 1 of 3 likes row(s)', self.transfer('import_posts', 'likes', 'likes.ndjson'))
+        self.transfer('import_posts', 'likes', 'likes.ndjson')
+        self.assertEqual(Like.objects.filter(post=self.other).count(), 1)
+        self.assertEqual(Post.objects.get(pk=self.other.pk).like_count, 1)
+
+    def test_failed_import_keeps_timestamps_and_moves_the_sequence(self):
+        rows = [
+            {'id': 500, 'author': 'alice', 'title': 'Kept', 'content': '-', 'created_at': '2020-01-02T03:04:05+00:00'},
+            {'author': 'bob', 'title': 'No ID', 'content': '-', 'created_at': '2021-01-01T00:00:00+00:00'},
+            {'id': 501, 'author': 'alice', 'content': 'No title'},
+        ]
+        with open(self.path('posts.ndjson'), 'w') as file:
+            file.writelines(json.dumps(row) + '\n' for row in rows)
+
+        with self.assertRaises(CommandError):
+            call_command('import_posts', 'posts', self.path('posts.ndjson'), '--batch-size', '2',
+                         stdout=StringIO(), stderr=StringIO())
+        # The first batch was committed before the second one failed.
+        self.assertEqual(Post.objects.get(pk=500).created_at, datetime(2020, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc))
+        self.assertEqual(Post.objects.get(title='No ID').created_at, datetime(2021, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertFalse(Post.objects.filter(content='No title').exists())
+        new = Post.objects.create(title='New', content='-', author=self.bob)
+        self.assertGreater(new.pk, 500)
@@ -0,0 +1,224 @@
+"""Materialized home timelines (fan-out-on-write).
+
+New posts are pushed into a ``TimelineEntry`` row for every follower of the
+author, so reading a page of the feed is a single bounded slice of the
+``(user, -created_at, -post)`` index instead of a scan over every followed author's
+posts. Authors with more than ``FEED_FANOUT_MAX_FOLLOWERS`` followers are not
+fanned out; their posts are merged into the feed at read time instead. That
+set is recomputed by ``refresh_celebrities``, never patched by requests.
+
+Fan-out only appends, so ``trim_timelines`` periodically cuts every timeline
+back to its newest ``FEED_TIMELINE_LENGTH`` entries; older entries are never
+read anyway.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from accounts import graph
+
+from .models import Post, TimelineEntry
+
+CELEBRITIES_CACHE_KEY = 'timeline:celebrities'
+FANOUT_BATCH_SIZE = 1000
+
+
+def _compute_celebrity_ids():
+    return set(
+        get_user_model().objects
+        .annotate(follower_count=Count('followers'))
+        .filter(follower_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS)
+        .values_list('id', flat=True)
+    )
+
+
+def get_celebrity_ids():
+    """Return the IDs of authors whose posts are merged at read time."""
+    celebrity_ids = cache.get(CELEBRITIES_CACHE_KEY)
+    if celebrity_ids is None:
+        celebrity_ids = _compute_celebrity_ids()
+        cache.set(CELEBRITIES_CACHE_KEY, celebrity_ids, None)
+    return celebrity_ids
+
+
+def refresh_celebrities():
+    """Recompute the celebrity set from follower counts. Returns ``(added, removed)`` author IDs.
+
+    The only writer of the cached set besides a cache miss, so concurrent
+    requests never overwrite each other's changes. Authors who dropped below
+    ``FEED_FANOUT_MAX_FOLLOWERS`` had their posts merged at read time and never
+    fanned out; those are pushed to their followers before the merge stops, so
+    they don't drop out of feeds.
+    """
+    old = get_celebrity_ids()
+    new = _compute_celebrity_ids()
+    for author_id in sorted(old - new):
+        _fan_out_recent(author_id)
+    cache.set(CELEBRITIES_CACHE_KEY, new, None)
+    return new - old, old - new
+
+
+def _push(posts, user_ids):
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=post.id, created_at=post.created_at)
+        for post in posts
+        for user_id in user_ids
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def _fan_out_recent(author_id):
+    """Push an author's recent posts into all of their followers' timelines.
+
+    The timelines grow past ``FEED_TIMELINE_LENGTH`` until ``trim_timelines``
+    runs.
+    """
+    recent = list(Post.objects.filter(author_id=author_id).order_by('-created_at')[:settings.FEED_TIMELINE_LENGTH])
+    if not recent:
+        return
+    follower_ids = sorted(graph.follower_ids(author_id))
+    # Keep each batch to about FANOUT_BATCH_SIZE entries.
+    step = max(1, FANOUT_BATCH_SIZE // len(recent))
+    for start in range(0, len(follower_ids), step):
+        _push(recent, follower_ids[start:start + step])
+
+
+def fan_out_post(post):
+    """Push a newly created post into its author's followers' timelines.
+
+    Authors in the celebrity set are skipped. One who just passed
+    ``FEED_FANOUT_MAX_FOLLOWERS`` is still fanned out until
+    ``refresh_celebrities`` adds them to the set.
+    """
+    if post.author_id in get_celebrity_ids():
+        return
+
+    follower_ids = sorted(graph.follower_ids(post.author_id))
+    for start in range(0, len(follower_ids), FANOUT_BATCH_SIZE):
+        _push([post], follower_ids[start:start + FANOUT_BATCH_SIZE])
+
+
+def backfill(user, author):
+    """Copy an author's recent posts into a new follower's timeline."""
+    backfill_many(user, [author.id])
+
+
+def backfill_many(user, author_ids):
+    """Copy the recent posts of several newly followed authors in one query."""
+    author_ids = set(author_ids) - get_celebrity_ids()
+    if not author_ids:
+        return
+    recent = Post.objects.filter(author_id__in=author_ids).order_by('-created_at')[:settings.FEED_TIMELINE_LENGTH]
+    _push(recent, [user.id])
+    trim(user.id)
+
+
+def trim(user_id):
+    """Delete the user's timeline entries beyond the newest ``FEED_TIMELINE_LENGTH``. Returns how many."""
+    length = settings.FEED_TIMELINE_LENGTH
+    boundary = list(
+        TimelineEntry.objects.filter(user_id=user_id)
+        .order_by('-created_at', '-post_id')
+        .values_list('created_at', 'post_id')[length:length + 1]
+    )
+    if not boundary:
+        return 0
+    created_at, post_id = boundary[0]
+    deleted, _ = TimelineEntry.objects.filter(
+        Q(created_at__lt=created_at) | Q(created_at=created_at, post_id__lte=post_id),
+        user_id=user_id,
+    ).delete()
+    return deleted
+
+
+def overgrown_user_ids():
+    """IDs of the users whose timeline holds more than ``FEED_TIMELINE_LENGTH`` entries."""
+    return (
+        TimelineEntry.objects.order_by().values('user_id')
+        .annotate(entries=Count('id')).filter(entries__gt=settings.FEED_TIMELINE_LENGTH)
+        .values_list('user_id', flat=True)
+    )
+
+
+def remove_author(user, author):
+    """Drop an unfollowed author's posts from a user's timeline."""
+    remove_authors(user, [author.id])
+
+
+def remove_authors(user, author_ids):
+    TimelineEntry.objects.filter(user=user, post__author_id__in=author_ids).delete()
+
+
+def _followed_celebrities(user):
+    celebrity_ids = get_celebrity_ids()
+    if not celebrity_ids:
+        return set()
+    return graph.following_ids(user.id) & celebrity_ids
+
+
+def _seek(id_field, position, descending):
+    created_at, post_id = position
+    op = 'lt' if descending else 'gt'
+    return Q(**{f'created_at__{op}': created_at}) | Q(created_at=created_at, **{f'{id_field}__{op}': post_id})
+
+
+def timeline_keys(user_id, limit, position=None, reverse=False):
+    """The user's timeline entries after ``position``, as ``(created_at, post_id)`` keys.
+
+    Newest first and older than ``position``, or with ``reverse`` oldest first
+    and newer than it; one range of the ``(user, -created_at, -post)`` index.
+    """
+    sign = '' if reverse else '-'
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    if position is not None:
+        entries = entries.filter(_seek('post_id', position, not reverse))
+    return entries.order_by(f'{sign}created_at', f'{sign}post_id').values_list('created_at', 'post_id')[:limit]
+
+
+def celebrity_keys(author_ids, limit, position=None, reverse=False):
+    """Like ``timeline_keys()`` for the posts of ``author_ids``, merged at read time."""
+    sign = '' if reverse else '-'
+    posts = Post.objects.filter(author_id__in=author_ids)
+    if position is not None:
+        posts = posts.filter(_seek('id', position, not reverse))
+    return posts.order_by(f'{sign}created_at', f'{sign}id').values_list('created_at', 'id')[:limit]
+
+
+def get_feed_keys(user, limit, position=None, reverse=False):
+    """Return up to ``limit`` ``(created_at, post_id)`` keys of the user's home feed.
+
+    Keys are newest first and older than ``position`` (a key), or, with
+    ``reverse``, oldest first and newer than it. The timeline and the
+    followed celebrities' posts are each read as one index range and merged
+    here, so no query sorts or counts the whole feed.
+    """
+    keys = list(timeline_keys(user.id, limit, position, reverse))
+    followed_celebrities = _followed_celebrities(user)
+    if followed_celebrities:
+        keys += celebrity_keys(followed_celebrities, limit, position, reverse)
+        # A post fanned out before its author became a celebrity is in both.
+        keys = sorted(set(keys), reverse=not reverse)[:limit]
+    return keys
+
+
+def get_feed_queryset(user):
+    """Return the posts of the user's home feed, for looking up single posts."""
+    timeline = TimelineEntry.objects.filter(user=user).values('post_id')
+    condition = Q(id__in=timeline)
+    followed_celebrities = _followed_celebrities(user)
+    if followed_celebrities:
+        condition |= Q(author_id__in=followed_celebrities)
+    return Post.objects.filter(condition)
+
+
+def rebuild(user):
+    """Rebuild a user's timeline from scratch out of the follow graph."""
+    TimelineEntry.objects.filter(user=user).delete()
+    celebrity_ids = get_celebrity_ids()
+    recent = (
+        Post.objects
+        .filter(author_id__in=graph.following_ids(user.id) - celebrity_ids)
+        .order_by('-created_at')[:settings.FEED_TIMELINE_LENGTH]
+    )
+    _push(recent, [user.id])
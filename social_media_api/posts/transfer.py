@@ -0,0 +1,271 @@
+"""Bulk import and export of posts, comments, likes and follow edges.
+
+Records are streamed as NDJSON (one JSON object per line) or CSV, optionally
+gzip-compressed, one kind per file, so memory use does not grow with the
+dataset:
+
+* export reads with ``iterator(chunk_size=...)`` (a server-side cursor on
+  PostgreSQL) and writes each row as it arrives;
+* import groups rows into batches and writes each batch in one transaction:
+  one query to resolve its usernames, one to check its post IDs and one
+  multi-row INSERT that ignores conflicts, so re-running an import skips the
+  rows that are already there.
+
+Users are referenced by username and must exist; posts keep their IDs, so
+comments and likes exported alongside them still point at the right post.
+Rows referring to unknown users or posts are skipped and counted. Imports
+bypass model signals: no notifications are sent and timelines are not fanned
+out (run ``rebuild_timelines`` afterwards), but ``like_count`` and
+``comment_count``, the follow graph cache and the anonymous response cache
+are brought up to date batch by batch.
+"""
+import csv
+import gzip
+import json
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts import graph
+
+from . import cache
+from .models import Comment, Like, Post
+
+FORMATS = ('ndjson', 'csv')
+EXTENSIONS = {'.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'ndjson', '.csv': 'csv'}
+
+# Columns of each kind, in file order.
+COLUMNS = {
+    'posts': ('id', 'author', 'title', 'content', 'created_at', 'updated_at'),
+    'comments': ('id', 'post', 'author', 'content', 'created_at', 'updated_at'),
+    'likes': ('user', 'post'),
+    'follows': ('follower', 'followed'),
+}
+
+
+def guess_format(path):
+    """The format implied by ``path``'s extension (ignoring ``.gz``), or None."""
+    if path.endswith('.gz'):
+        path = path[:-3]
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+@contextmanager
+def open_file(path, mode):
+    """Open ``path`` as text for ``mode`` 'r' or 'w'; ``-`` is stdin/stdout."""
+    if path == '-':
+        yield sys.stdin if mode == 'r' else sys.stdout
+        return
+    opener = gzip.open if path.endswith('.gz') else open
+    # newline='' lets the csv module handle line endings inside quoted values.
+    with opener(path, mode + 't', encoding='utf-8', newline='') as file:
+        yield file
+
+
+def read(file, file_format):
+    """Yield each record of ``file`` as a dict."""
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write(file, file_format, kind, rows):
+    """Write ``rows`` to ``file``; returns how many were written."""
+    count = 0
+    if file_format == 'csv':
+        writer = csv.DictWriter(file, COLUMNS[kind])
+        writer.writeheader()
+        for count, row in enumerate(rows, start=1):
+            writer.writerow(row)
+    else:
+        for count, row in enumerate(rows, start=1):
+            file.write(json.dumps(row, ensure_ascii=False) + '\n')
+    return count
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_rows(kind, chunk_size):
+    """Yield every record of ``kind`` as a dict, in primary key order."""
+    queryset = {
+        'posts': Post.objects.values_list(
+            'id', 'author__username', 'title', 'content', 'created_at', 'updated_at'),
+        'comments': Comment.objects.values_list(
+            'id', 'post_id', 'author__username', 'content', 'created_at', 'updated_at'),
+        'likes': Like.objects.values_list('user__username', 'post_id'),
+        # A through row (from_customuser=A, to_customuser=B) means B follows A.
+        'follows': graph.Follow.objects.values_list('to_customuser__username', 'from_customuser__username'),
+    }[kind]
+    for row in queryset.order_by('id').iterator(chunk_size=chunk_size):
+        yield dict(zip(COLUMNS[kind], map(_value, row)))
+
+
+def _int(value):
+    # CSV cells are strings, and empty when there is no value.
+    return int(value) if value not in (None, '') else None
+
+
+def _timestamp(value, default):
+    if isinstance(value, str) and value:
+        parsed = parse_datetime(value)
+        if parsed is not None:
+            return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+    return default
+
+
+def _user_ids(usernames):
+    return dict(get_user_model().objects.filter(username__in=set(usernames)).values_list('username', 'id'))
+
+
+def _post_ids(ids):
+    return set(Post.objects.filter(id__in=set(ids)).values_list('id', flat=True))
+
+
+def _insert_as_given(model, objs):
+    """Insert ``objs`` with every field as given, skipping rows that already exist.
+
+    ``bulk_create()`` calls each field's ``pre_save()``, which replaces
+    created_at/updated_at with the current time. A raw insert, the kind
+    ``loaddata`` does, writes the given values instead.
+    """
+    opts = model._meta
+    fields = [field for field in opts.concrete_fields if not field.generated]
+    groups = (
+        ([obj for obj in objs if obj.pk is not None], fields),
+        # Rows without an ID take the next one from the sequence.
+        ([obj for obj in objs if obj.pk is None], [field for field in fields if field is not opts.pk]),
+    )
+    for group, group_fields in groups:
+        batch_size = max(connection.ops.bulk_batch_size(group_fields, group), 1)
+        for start in range(0, len(group), batch_size):
+            model._base_manager._insert(
+                group[start:start + batch_size], fields=group_fields, raw=True, on_conflict=OnConflict.IGNORE,
+            )
+
+
+def _recount(post_ids):
+    """Recompute like_count and comment_count of ``post_ids`` from the rows."""
+    def count_of(model):
+        counts = (
+            model.objects.filter(post=OuterRef('pk'))
+            .order_by().values('post').annotate(n=Count('pk')).values('n')
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    Post.objects.filter(id__in=post_ids).update(like_count=count_of(Like), comment_count=count_of(Comment))
+    # List pages show the counts too.
+    cache.invalidate_posts(post_ids)
+
+
+def _import_posts(rows):
+    now = timezone.now()
+    authors = _user_ids(row['author'] for row in rows)
+    posts = [
+        Post(
+            id=_int(row.get('id')),
+            author_id=authors[row['author']],
+            title=row['title'],
+            content=row['content'],
+            created_at=_timestamp(row.get('created_at'), now),
+            updated_at=_timestamp(row.get('updated_at'), now),
+        )
+        for row in rows if row['author'] in authors
+    ]
+    _insert_as_given(Post, posts)
+    cache.bump('posts')
+    return len(posts)
+
+
+def _import_comments(rows):
+    now = timezone.now()
+    authors = _user_ids(row['author'] for row in rows)
+    posts = _post_ids(_int(row['post']) for row in rows)
+    comments = [
+        Comment(
+            id=_int(row.get('id')),
+            post_id=_int(row['post']),
+            author_id=authors[row['author']],
+            content=row['content'],
+            created_at=_timestamp(row.get('created_at'), now),
+            updated_at=_timestamp(row.get('updated_at'), now),
+        )
+        for row in rows if row['author'] in authors and _int(row['post']) in posts
+    ]
+    _insert_as_given(Comment, comments)
+    post_ids = {comment.post_id for comment in comments}
+    _recount(post_ids)
+    cache.bump_many(f'comments:{post_id}' for post_id in post_ids)
+    return len(comments)
+
+
+def _import_likes(rows):
+    users = _user_ids(row['user'] for row in rows)
+    posts = _post_ids(_int(row['post']) for row in rows)
+    likes = [
+        Like(user_id=users[row['user']], post_id=_int(row['post']))
+        for row in rows if row['user'] in users and _int(row['post']) in posts
+    ]
+    Like.objects.bulk_create(likes, ignore_conflicts=True)
+    _recount({like.post_id for like in likes})
+    return len(likes)
+
+
+def _import_follows(rows):
+    users = _user_ids([row['follower'] for row in rows] + [row['followed'] for row in rows])
+    edges = [
+        graph.Follow(from_customuser_id=users[row['followed']], to_customuser_id=users[row['follower']])
+        for row in rows
+        if row['follower'] in users and row['followed'] in users and row['follower'] != row['followed']
+    ]
+    graph.Follow.objects.bulk_create(edges, ignore_conflicts=True)
+    graph.invalidate({edge.to_customuser_id for edge in edges}, {edge.from_customuser_id for edge in edges})
+    return len(edges)
+
+
+IMPORTERS = {
+    'posts': _import_posts,
+    'comments': _import_comments,
+    'likes': _import_likes,
+    'follows': _import_follows,
+}
+
+
+def import_rows(kind, rows, batch_size):
+    """Import ``rows`` of ``kind`` batch by batch.
+
+    Yields ``(read, imported)`` running totals after each batch; ``imported``
+    leaves out rows with unknown users or posts but counts rows that already
+    existed.
+    """
+    rows = iter(rows)
+    read = imported = 0
+    try:
+        while batch := list(islice(rows, batch_size)):
+            with transaction.atomic():
+                imported += IMPORTERS[kind](batch)
+            read += len(batch)
+            yield read, imported
+    finally:
+        if kind in ('posts', 'comments'):
+            # Rows were inserted with their own IDs; move the sequence past
+            # them, also when a later batch failed after earlier ones committed.
+            model = Post if kind == 'posts' else Comment
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+                    cursor.execute(sql)
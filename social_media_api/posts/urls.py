@@ -9,7 +9,10 @@ router.register(r'posts', views.PostViewSet)
 router.register(r'comments', views.CommentViewSet)
 router.register(r'feed', views.FeedViewSet, basename='feed')
 
-urlpatterns = router.urls + [
+# Declared before the router so "likes" is not taken for a post pk.
+urlpatterns = [
+    path('posts/likes/', views.batch_like, name='batch-like'),
+] + router.urls + [
     path('posts/<int:pk>/like/', views.like_post, name='like-post'),
     path('posts/<int:pk>/unlike/', views.unlike_post, name='unlike-post'),
     path('feed/', views.FeedViewSet.as_view({'get': 'list'}), name='feed'),
@@ -1,15 +1,35 @@
+from functools import partial
+from asgiref.sync import sync_to_async
+from adrf import decorators as async_decorators, viewsets as async_viewsets
 from django.shortcuts import render
+from django.db import transaction
+from django.db.models import F
 from rest_framework import viewsets, permissions
 from .models import *
 from .serializers import *
-from notifications.models import Notification
+from notifications import dispatch
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status, generics
+from . import likes, timeline
+from .async_views import AsyncListModelMixin
+from .cache import cache_anonymous, invalidate_comments, invalidate_post
+from .pagination import CommentKeysetPagination, FeedPagination, KeysetPaginationMixin
+from .search import FullTextSearchFilter
+from .shaping import QueryShapingMixin
+
+
+def adjust_counter(post_id, field, delta):
+    """Atomically add ``delta`` to one of a post's engagement counters."""
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(**{f'{field}__gte': -delta})
+    posts.update(**{field: F(field) + delta})
+    invalidate_post(post_id)
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -17,20 +37,28 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(QueryShapingMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
     """ViewSet for Post CRUD operations with filtering and pagination."""
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     pagination_class = StandardResultsSetPagination
    
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['author', 'created_at']  # exact matching
     ordering_fields = ['created_at', 'updated_at', 'title']  # ordering
+    ordering = ['-created_at', '-id']  # default, served by posts_post_created_id
     search_fields = ['title', 'content']  # search by keyword
     
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        timeline.fan_out_post(post)
+
+    def list(self, request, *args, **kwargs):
+        return cache_anonymous(request, 'posts', partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return cache_anonymous(request, f"post:{kwargs['pk']}", partial(super().retrieve, request, *args, **kwargs))
     
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
@@ -44,19 +72,44 @@ class PostViewSet(viewsets.ModelViewSet):
             return Post.objects.filter(author=self.request.user)
         return Post.objects.all()
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(QueryShapingMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     pagination_class = StandardResultsSetPagination
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    keyset_pagination_class = CommentKeysetPagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
 
     filterset_fields = ['post', 'author']  # exact matching
     ordering_fields = ['created_at', 'updated_at']  # ordering
+    ordering = ['created_at', 'id']  # default, served by posts_comment_post_created
     search_fields = ['content']  # search by keyword
      
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        comment = serializer.save(author=self.request.user)
+        adjust_counter(comment.post_id, 'comment_count', 1)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old_post_id = serializer.instance.post_id
+        comment = serializer.save()
+        if comment.post_id != old_post_id:
+            adjust_counter(old_post_id, 'comment_count', -1)
+            adjust_counter(comment.post_id, 'comment_count', 1)
+            invalidate_comments(old_post_id)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        post_id = instance.post_id
+        instance.delete()
+        adjust_counter(post_id, 'comment_count', -1)
+
+    def list(self, request, *args, **kwargs):
+        post_id = request.query_params.get('post', '')
+        if not post_id.isdigit():
+            return super().list(request, *args, **kwargs)
+        return cache_anonymous(request, f'comments:{post_id}', partial(super().list, request, *args, **kwargs))
     
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
@@ -70,43 +123,61 @@ class CommentViewSet(viewsets.ModelViewSet):
             return Comment.objects.filter(author=self.request.user)
         return Comment.objects.all()
     
-class FeedViewSet(viewsets.ReadOnlyModelViewSet):
+class FeedViewSet(QueryShapingMixin, AsyncListModelMixin, async_viewsets.ReadOnlyModelViewSet):
     queryset = Post.objects.none()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = FeedPagination
+    filter_backends = []
 
     def get_queryset(self):
+        if self.action == 'list':
+            # FeedPagination picks the page's posts from the timeline.
+            return Post.objects.all()
         try:
-            user = self.request.user
-            following_users = user.following.all()
-            return Post.objects.filter(author__in=following_users).order_by('-created_at')
+            return timeline.get_feed_queryset(self.request.user)
         except AttributeError:
             return Post.objects.none()    
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def like_post(request, pk):
-    post = generics.get_object_or_404(Post, pk=pk)
-    like, created = Like.objects.get_or_create(user=request.user, post=post)
-    if not created:
+def notify_likes(user, liked):
+    """Notify the authors of newly liked posts, except the liker."""
+    dispatch.notify_many(
+        (author_id, user.id, 'liked your post', Post(pk=post_id, author_id=author_id))
+        for post_id, author_id in liked.items()
+        if author_id != user.id
+    )
+
+
+@transaction.atomic
+def _like_post(user, pk):
+    liked = likes.like(user.id, [pk])
+    if not liked:
+        generics.get_object_or_404(Post.objects.only('id'), pk=pk)
         return Response({'error': 'Post already liked'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    if request.user != post.author:
-        from django.contrib.contenttypes.models import ContentType
-        content_type = ContentType.objects.get_for_model(Post)
-        Notification.objects.create(
-            recipient=post.author,
-            actor=request.user,
-            verb='liked your post',
-            target_content_type=content_type,
-            target_object_id=post.id
-        )
+    notify_likes(user, liked)
     return Response({'message': 'Post liked'})
 
+@async_decorators.api_view(['POST'])
+@permission_classes([IsAuthenticated])
+async def like_post(request, pk):
+    return await sync_to_async(_like_post)(request.user, pk)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def unlike_post(request, pk):
-    post = generics.get_object_or_404(Post, pk=pk)
-    Like.objects.filter(user=request.user, post=post).delete()
+    if not likes.unlike(request.user.id, [pk]):
+        generics.get_object_or_404(Post.objects.only('id'), pk=pk)
     return Response({'message': 'Post unliked'})
- 
\ No newline at end of file
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@transaction.atomic
+def batch_like(request):
+    """Like or unlike up to 100 posts in one request."""
+    serializer = BatchLikeSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    post_ids = serializer.validated_data['post_ids']
+    if serializer.validated_data['action'] == 'like':
+        liked = likes.like(request.user.id, post_ids)
+        notify_likes(request.user, liked)
+        return Response({'liked': sorted(liked)})
+    return Response({'unliked': likes.unlike(request.user.id, post_ids)})
@@ -0,0 +1,195 @@
+"""Read replica routing.
+
+``ReplicaRoutingMiddleware`` marks each request as safe (GET, HEAD, OPTIONS)
+or not, and ``ReplicaRouter`` sends the reads of safe requests to one of the
+``DATABASE_REPLICAS`` aliases; everything else uses ``default``:
+
+* the state lives in a context variable, so it follows the request into
+  ``sync_to_async`` threads, and code running outside a request (management
+  commands, the shell, background threads) always reads from the primary;
+* a request picks one replica and keeps it, so its reads see one snapshot;
+* once a request writes, its remaining reads go to the primary;
+* a user who wrote, or made any unsafe request, is pinned to the primary for
+  ``DB_REPLICA_PIN_SECONDS`` (a cache key), so they read their own writes while
+  the replicas catch up.
+  The authentication classes report the user through ``identify()``;
+* each replica is probed at most every ``DB_REPLICA_CHECK_INTERVAL`` seconds
+  per process. One that cannot be reached or lags more than
+  ``DB_REPLICA_MAX_LAG`` seconds is skipped until a later probe passes, and
+  with no healthy replica reads fall back to the primary.
+
+The pin window should cover ``DB_REPLICA_MAX_LAG`` plus the check interval:
+a replica that is still in use is then never further behind than the pin.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Read from the primary even in safe requests. A token is read right after
+# the login that created it, before the user is known and can be pinned.
+PRIMARY_MODELS = {'authtoken.token'}
+
+# Seconds since the last replayed transaction, or 0 when the replica has
+# replayed everything it received (an idle primary writes nothing to replay).
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+logger = logging.getLogger(__name__)
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+# {alias: (healthy, checked_at)}, shared by the threads of a process.
+_health = {}
+_health_lock = threading.Lock()
+
+
+class RequestState:
+    def __init__(self, method):
+        self.safe = method in SAFE_METHODS
+        self.wrote = False
+        self.user_id = None
+        self.pinned = None
+        self.replica = None
+
+    @property
+    def pins(self):
+        """Whether the user should read from the primary for a while after this request.
+
+        Unsafe requests count even if the router saw no write: raw SQL on
+        ``connection.cursor()`` (likes, for one) bypasses it.
+        """
+        return self.user_id is not None and (self.wrote or not self.safe)
+
+
+def _pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+
+def identify(user_id):
+    """Record the authenticated user of the current request, if there is one."""
+    state = _state.get()
+    if state is not None and state.user_id != user_id:
+        state.user_id = user_id
+        state.pinned = None
+
+
+def _check(alias):
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(POSTGRES_LAG_SQL)
+                lag = cursor.fetchone()[0]
+            else:
+                cursor.execute('SELECT 1')
+                lag = 0
+    except DatabaseError:
+        logger.warning('Replica %s is unreachable; reading from the primary', alias, exc_info=True)
+        return False
+    if lag > settings.DB_REPLICA_MAX_LAG:
+        logger.warning('Replica %s is %.1f seconds behind; reading from the primary', alias, lag)
+        return False
+    return True
+
+
+def is_healthy(alias):
+    """Whether ``alias`` passed its last probe, probing again once the last one is stale."""
+    now = time.monotonic()
+    healthy, checked_at = _health.get(alias, (False, None))
+    if checked_at is not None and now - checked_at < settings.DB_REPLICA_CHECK_INTERVAL:
+        return healthy
+    healthy = _check(alias)
+    with _health_lock:
+        _health[alias] = (healthy, now)
+    return healthy
+
+
+def reset():
+    """Forget the replica probe results of this process."""
+    with _health_lock:
+        _health.clear()
+
+
+class ReplicaRouter:
+    def _replica(self, state):
+        if state.replica is None:
+            healthy = [alias for alias in settings.DATABASE_REPLICAS if is_healthy(alias)]
+            state.replica = random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.safe or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if not settings.DATABASE_REPLICAS or model._meta.label_lower in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS
+        if state.user_id is not None and state.pinned is None:
+            state.pinned = bool(cache.get(_pin_key(state.user_id)))
+        if state.pinned:
+            return DEFAULT_DB_ALIAS
+        return self._replica(state)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = RequestState(request.method)
+        token = _state.set(state)
+        try:
+            return self.get_response(request)
+        finally:
+            _state.reset(token)
+            if state.pins:
+                cache.set(_pin_key(state.user_id), True, settings.DB_REPLICA_PIN_SECONDS)
+
+    async def __acall__(self, request):
+        state = RequestState(request.method)
+        token = _state.set(state)
+        try:
+            return await self.get_response(request)
+        finally:
+            _state.reset(token)
+            if state.pins:
+                await cache.aset(_pin_key(state.user_id), True, settings.DB_REPLICA_PIN_SECONDS)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 from dotenv import load_dotenv
@@ -57,6 +58,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
+    'rest_framework_simplejwt.token_blacklist',
     'accounts',
     'posts',
     'django_filters',
@@ -65,6 +67,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'social_media_api.db_routing.ReplicaRoutingMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -112,6 +115,17 @@ DB_PASSWORD = os.environ.get('DB_PASSWORD')
 if not DB_PASSWORD:
     raise ValueError('DB_PASSWORD environment variable must be set')
 
+# Connection reuse. DB_POOL=true shares a psycopg 3 connection pool between
+# the threads of each worker process (requires psycopg[pool]). Otherwise each
+# thread keeps its connection for DB_CONN_MAX_AGE seconds, checked before reuse
+# when DB_CONN_HEALTH_CHECKS is on. Persistent connections do not suit ASGI,
+# where requests run on changing threads, so they default to off there.
+DB_POOL = os.environ.get('DB_POOL', 'false').lower() in ('1', 'true', 'yes')
+DB_CONN_MAX_AGE = int(os.environ.get(
+    'DB_CONN_MAX_AGE', '0' if os.environ.get('SERVER_MODE') == 'asgi' else '60'
+))
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', 'true').lower() in ('1', 'true', 'yes')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -120,8 +134,45 @@ DATABASES = {
         'PASSWORD': DB_PASSWORD,
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # The pool hands connections back after each request itself.
+        'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        'OPTIONS': {},
     }
 }
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+        # Seconds a request waits for a free connection before failing.
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+    }
+
+# Read replicas: each host in DB_REPLICA_HOSTS ("host" or "host:port") becomes
+# a replica_<n> alias with the primary's credentials. GET/HEAD/OPTIONS reads go
+# to a healthy replica; see social_media_api/db_routing.py. Under test the
+# aliases mirror the default database.
+DB_REPLICA_HOSTS = [host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host]
+DATABASE_REPLICAS = []
+for number, host in enumerate(DB_REPLICA_HOSTS, start=1):
+    host, _, port = host.partition(':')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'OPTIONS': {**DATABASES['default']['OPTIONS']},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['social_media_api.db_routing.ReplicaRouter']
+# Seconds a user reads from the primary after writing; keep it at least
+# DB_REPLICA_MAX_LAG + DB_REPLICA_CHECK_INTERVAL.
+DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', '10'))
+# Replicas further behind than this many seconds are skipped; each is probed
+# at most once per DB_REPLICA_CHECK_INTERVAL seconds per process.
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', '5'))
+DB_REPLICA_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', '5'))
 
 
 # Password validation
@@ -142,6 +193,21 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# New hashes use PASSWORD_HASH_ITERATIONS; older ones are upgraded on login.
+PASSWORD_HASHERS = [
+    'accounts.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', '1000000'))
+# Threads hashing passwords in each process, and how many hashes may run or wait
+# across all processes sharing the cache before logins get a 429.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_MAX_IN_FLIGHT = int(os.environ.get('PASSWORD_HASH_MAX_IN_FLIGHT', '20'))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -164,6 +230,11 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Uploads larger than this are streamed to a temporary file instead of memory.
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('FILE_UPLOAD_MAX_MEMORY_SIZE', str(256 * 1024)))
+# Largest accepted profile picture, and threads rendering avatar thumbnails per process.
+AVATAR_MAX_UPLOAD_SIZE = int(os.environ.get('AVATAR_MAX_UPLOAD_SIZE', str(5 * 1024 * 1024)))
+AVATAR_THUMBNAIL_WORKERS = int(os.environ.get('AVATAR_THUMBNAIL_WORKERS', '2'))
 
 
 
@@ -192,6 +263,53 @@ CACHES = {
         'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
     }
 }
+# Seconds an anonymous post/comment response stays cached (writes invalidate sooner)
+POSTS_CACHE_TIMEOUT = int(os.environ.get('POSTS_CACHE_TIMEOUT', '300'))
+
+# Feed Configuration
+# Number of posts kept in each user's materialized home timeline.
+FEED_TIMELINE_LENGTH = int(os.environ.get('FEED_TIMELINE_LENGTH', '800'))
+# Authors with more followers than this are merged into feeds at read time.
+FEED_FANOUT_MAX_FOLLOWERS = int(os.environ.get('FEED_FANOUT_MAX_FOLLOWERS', '10000'))
+
+# Notification Configuration
+# 'outbox' queues events for `manage.py process_notifications`; 'inline' writes them immediately.
+NOTIFICATIONS_DISPATCH = os.environ.get('NOTIFICATIONS_DISPATCH', 'outbox')
+# How open notification streams learn about new rows: 'memory' (this process only) or 'redis'.
+# The outbox worker writes from another process, so only 'redis' wakes web streams promptly.
+NOTIFICATIONS_PUBSUB = os.environ.get('NOTIFICATIONS_PUBSUB', 'redis' if NOTIFICATIONS_DISPATCH == 'outbox' else 'memory')
+NOTIFICATIONS_PUBSUB_URL = os.environ.get('NOTIFICATIONS_PUBSUB_URL', os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'))
+# Seconds between stream keepalives (each also re-checks for missed rows), and a stream's lifetime.
+NOTIFICATIONS_STREAM_HEARTBEAT = int(os.environ.get('NOTIFICATIONS_STREAM_HEARTBEAT', '15'))
+NOTIFICATIONS_STREAM_MAX_SECONDS = int(os.environ.get('NOTIFICATIONS_STREAM_MAX_SECONDS', '300'))
+# Read notifications older than this are moved to the archive by `manage.py archive_notifications`.
+NOTIFICATIONS_RETENTION_DAYS = int(os.environ.get('NOTIFICATIONS_RETENTION_DAYS', '90'))
+
+# Authentication Configuration
+# Seconds a token -> user lookup stays cached (logout and user saves invalidate sooner).
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.environ.get('AUTH_TOKEN_CACHE_TIMEOUT', '300'))
+# 'token' issues legacy DB tokens, 'jwt' stateless access/refresh tokens, 'both' issues and accepts either.
+AUTH_TOKEN_MODE = os.environ.get('AUTH_TOKEN_MODE', 'token')
+if AUTH_TOKEN_MODE not in ('token', 'jwt', 'both'):
+    raise ValueError("AUTH_TOKEN_MODE must be 'token', 'jwt' or 'both'")
+AUTHENTICATION_CLASSES = {
+    'token': ['accounts.authentication.CachedTokenAuthentication'],
+    'jwt': ['accounts.authentication.StatelessJWTAuthentication'],
+    'both': [
+        'accounts.authentication.StatelessJWTAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
+    ],
+}
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.environ.get('JWT_ACCESS_TOKEN_MINUTES', '15'))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.environ.get('JWT_REFRESH_TOKEN_DAYS', '7'))),
+    # Every refresh returns a new refresh token and denylists the old one.
+    'ROTATE_REFRESH_TOKENS': True,
+    'BLACKLIST_AFTER_ROTATION': True,
+    'UPDATE_LAST_LOGIN': False,
+    'AUTH_HEADER_TYPES': ('Bearer',),
+}
 
 # Logging Configuration
 LOGGING = {
@@ -214,9 +332,7 @@ LOGGING = {
 }
 
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-    ],
+    'DEFAULT_AUTHENTICATION_CLASSES': AUTHENTICATION_CLASSES[AUTH_TOKEN_MODE],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
@@ -231,11 +347,13 @@ REST_FRAMEWORK = {
     
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
-        'user': '1000/day'
+        'user': '1000/day',
+        'login': os.environ.get('LOGIN_THROTTLE_RATE', '10/minute'),
     },
+    # Fixed-window counters instead of DRF's per-client timestamp lists.
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.AnonRateThrottle',
+        'social_media_api.throttling.UserRateThrottle',
+        'social_media_api.throttling.AnonRateThrottle',
     ],
 }
 
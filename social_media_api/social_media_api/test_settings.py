@@ -0,0 +1,14 @@
+"""Settings for running the test suite.
+
+    python manage.py test --settings=social_media_api.test_settings
+
+Without real replicas in ``DB_REPLICA_HOSTS``, adds a ``replica_1`` alias: a
+second connection to the test database for ``ReplicaRoutingTest`` to read
+through. It is not in ``DATABASE_REPLICAS``, so other tests keep reading from
+the primary.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, DATABASE_REPLICAS
+
+if not DATABASE_REPLICAS:
+    DATABASES['replica_1'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
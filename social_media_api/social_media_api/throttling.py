@@ -0,0 +1,114 @@
+"""Fixed-window rate throttles.
+
+DRF's ``SimpleRateThrottle`` keeps a list with the timestamp of every request
+in the window, and reads and rewrites the whole list on each request: up to
+1000 floats per user at ``1000/day``. These throttles keep one integer per
+client and window instead:
+
+* the counter key includes the window number, so a new window starts from a
+  fresh key and old ones simply expire;
+* on Redis, creating the counter with its expiry and incrementing it is one
+  ``SET NX EX`` + ``INCR`` transaction in a single round trip; other caches
+  use ``add()`` and ``incr()``;
+* a client that went over its limit is remembered in process memory until
+  its window ends, so its further requests are refused without touching the
+  cache at all.
+
+A fixed window lets a client send up to twice its rate around a window
+boundary. That is fine for abuse protection at these rates.
+"""
+import threading
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework import throttling
+
+# Upper bound on remembered over-limit clients per process.
+LOCAL_BLOCK_LIMIT = 10000
+
+_blocked = {}
+_blocked_lock = threading.Lock()
+
+
+def _increment(key, timeout):
+    """Add one to the counter at ``key``, creating it with ``timeout``. Returns the new count."""
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if isinstance(backend, RedisCache):
+        redis_key = backend.make_and_validate_key(key)
+        pipeline = backend._cache.get_client(redis_key, write=True).pipeline()
+        pipeline.set(redis_key, 0, ex=timeout, nx=True)
+        pipeline.incr(redis_key)
+        return pipeline.execute()[1]
+    if backend.add(key, 1, timeout):
+        return 1
+    try:
+        return backend.incr(key)
+    except ValueError:
+        # Expired between add() and incr().
+        backend.add(key, 1, timeout)
+        return 1
+
+
+def _block(key, until):
+    with _blocked_lock:
+        if len(_blocked) >= LOCAL_BLOCK_LIMIT:
+            now = time.time()
+            for stale in [k for k, end in _blocked.items() if end <= now]:
+                del _blocked[stale]
+            if len(_blocked) >= LOCAL_BLOCK_LIMIT:
+                _blocked.clear()
+        _blocked[key] = until
+
+
+def reset():
+    """Forget the clients blocked in this process (their cache counters are untouched)."""
+    with _blocked_lock:
+        _blocked.clear()
+
+
+class FixedWindowRateThrottleMixin:
+    """Replaces ``SimpleRateThrottle``'s timestamp history with a per-window counter."""
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        window = int(now // self.duration)
+        self.window_end = (window + 1) * self.duration
+        key = f'{self.key}:{window}'
+
+        if _blocked.get(key, 0) > now:
+            return False
+        count = _increment(key, self.duration)
+        if count > self.num_requests:
+            _block(key, self.window_end)
+            return False
+        return True
+
+    def wait(self):
+        return max(self.window_end - self.timer(), 0)
+
+
+class UserRateThrottle(FixedWindowRateThrottleMixin, throttling.UserRateThrottle):
+    pass
+
+
+class AnonRateThrottle(FixedWindowRateThrottleMixin, throttling.AnonRateThrottle):
+    pass
+
+
+class ScopedRateThrottle(FixedWindowRateThrottleMixin, throttling.ScopedRateThrottle):
+    def allow_request(self, request, view):
+        # DRF's version resolves the view's scope and then calls
+        # SimpleRateThrottle.allow_request directly, skipping the mixin.
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)